@@ -6,18 +6,31 @@ import os
 
 # Server socket
 bind = "127.0.0.1:8000"
-backlog = 2048
+# 処理しきれない接続を長く溜めると ALB 側で 30 秒のタイムアウトになるため、待ち行列は短くする
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 64))
 
 # Worker processes
-workers = multiprocessing.cpu_count() * 2 + 1  # 推奨フォーミュラ
-worker_class = "sync"
-worker_connections = 1000
+# 既定は gthread（少数プロセス × 多スレッド）
+# 予測パイプラインはスレッドセーフで、モデル・データはプロセス内で共有される。
+# 予測計算の同時実行数の制限（SNOW_DEEP_PREDICT_*）はプロセス内のスレッドに対して働くため、
+# sync ワーカーでは1リクエストずつしか処理せず制限は働かない（待ち行列は backlog のみ）
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gthread':
+    workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count()))
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+    # スレッドの空きを待つ接続をワーカー内に溜めすぎない（超過分は backlog で待つ）
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', threads * 2))
+else:
+    workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))  # 推奨フォーミュラ
+    worker_connections = 1000
 timeout = 30
 keepalive = 2
 
 # Restart workers periodically to prevent memory leaks
-max_requests = 1000
-max_requests_jitter = 100
+# /metrics/ の memory（RSS・キャッシュサイズの推移）で増加が見られなければ
+# GUNICORN_MAX_REQUESTS=0 で定期的な再起動を無効にできる
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
 
 # Preload application for better performance
 preload_app = True
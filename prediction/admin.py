@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import SkiResort, Prediction
+from .models import SkiResort, Prediction, PredictionDailyAggregate, BacktestResult, ResortClimatology
+from .paginator import EstimatedCountPaginator
 
 
 @admin.register(SkiResort)
@@ -13,5 +14,39 @@ class SkiResortAdmin(admin.ModelAdmin):
 class PredictionAdmin(admin.ModelAdmin):
     list_display = ('resort', 'created_at')
     list_filter = ('resort', 'created_at')
+    list_select_related = ('resort',)
     readonly_fields = ('created_at',)
     search_fields = ('resort__name',)
+    # 件数の多いログテーブルで COUNT(*) による全件走査を避ける
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        # 一覧では予測データ本体を読み込まない
+        queryset = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith('_changelist'):
+            queryset = queryset.defer('prediction_data')
+        return queryset
+
+
+@admin.register(PredictionDailyAggregate)
+class PredictionDailyAggregateAdmin(admin.ModelAdmin):
+    list_display = ('resort', 'date', 'count', 'first_at', 'last_at')
+    list_filter = ('resort', 'date')
+    list_select_related = ('resort',)
+    readonly_fields = ('updated_at',)
+    date_hierarchy = 'date'
+
+
+@admin.register(BacktestResult)
+class BacktestResultAdmin(admin.ModelAdmin):
+    list_display = ('resort', 'scope', 'label', 'mae', 'mape', 'n', 'updated_at')
+    list_filter = ('resort', 'scope')
+    readonly_fields = ('updated_at',)
+
+
+@admin.register(ResortClimatology)
+class ResortClimatologyAdmin(admin.ModelAdmin):
+    list_display = ('resort', 'month', 'mean', 'median', 'p10', 'p90', 'record', 'record_date', 'n', 'updated_at')
+    list_filter = ('resort',)
+    readonly_fields = ('updated_at',)
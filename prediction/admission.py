@@ -0,0 +1,87 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class AdmissionRejected(Exception):
+    """同時実行数・待機キューの上限を超えたため受け付けられない"""
+
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLimiter:
+    """重い処理の同時実行数を制限する（超過分は待機キューで期限付きで待つ）"""
+
+    def __init__(self, max_concurrency, max_queue, queue_timeout, retry_after):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._waiting = 0
+        self._counters = {
+            'admitted': 0,
+            'rejected_queue_full': 0,
+            'rejected_timeout': 0,
+            'rejected_flight_timeout': 0,
+            'served_stale': 0,
+        }
+
+    @contextmanager
+    def admit(self):
+        """実行枠を確保してから処理を実行"""
+        with self._cond:
+            if self._in_flight >= self.max_concurrency:
+                if self._waiting >= self.max_queue:
+                    self._counters['rejected_queue_full'] += 1
+                    raise AdmissionRejected('queue_full', self.retry_after)
+                self._wait_for_slot()
+            self._in_flight += 1
+            self._counters['admitted'] += 1
+
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify()
+
+    def _wait_for_slot(self):
+        deadline = time.monotonic() + self.queue_timeout
+        self._waiting += 1
+        try:
+            while self._in_flight >= self.max_concurrency:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._counters['rejected_timeout'] += 1
+                    raise AdmissionRejected('timeout', self.retry_after)
+                self._cond.wait(remaining)
+        finally:
+            self._waiting -= 1
+
+    def reject(self, reason):
+        """同時実行数の制限以外の理由で受け付けられなかったことを記録し、送出する例外を返す"""
+        with self._cond:
+            self._counters[f'rejected_{reason}'] += 1
+        return AdmissionRejected(reason, self.retry_after)
+
+    def record_stale(self):
+        """拒否の代わりに古いキャッシュを返したことを記録"""
+        with self._cond:
+            self._counters['served_stale'] += 1
+
+    def stats(self):
+        """キュー長・拒否数などの統計"""
+        with self._cond:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'in_flight': self._in_flight,
+                'queue_depth': self._waiting,
+                **self._counters,
+            }
@@ -0,0 +1,126 @@
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from prophet.diagnostics import prophet_copy
+from prophet.serialize import model_to_json
+
+from .utils import create_future_dataframe, get_observed_data, get_season_start_year, get_training_data
+
+
+def get_model_config(model):
+    """学習結果に影響するモデル設定（学習済みパラメータを除く）"""
+    return {
+        'growth': model.growth,
+        'n_changepoints': model.n_changepoints,
+        'changepoint_range': model.changepoint_range,
+        'changepoint_prior_scale': model.changepoint_prior_scale,
+        'seasonality_mode': model.seasonality_mode,
+        'seasonality_prior_scale': model.seasonality_prior_scale,
+        'seasonalities': {
+            name: {key: props[key] for key in ('period', 'fourier_order', 'prior_scale', 'mode')}
+            for name, props in model.seasonalities.items()
+        },
+        'extra_regressors': {
+            name: {key: props[key] for key in ('prior_scale', 'standardize', 'mode')}
+            for name, props in model.extra_regressors.items()
+        },
+    }
+
+
+def make_folds(model, historical_df, seasons):
+    """ローリングオリジンの fold を作成（各シーズン開始前までのデータで学習）
+
+    学習データは配信中のモデルと同じ前処理とし、評価は積雪量の観測がある月のみで行う。
+    """
+    training_df = get_training_data(model, historical_df)
+    observed_df = get_observed_data(historical_df)
+    season_years = sorted(get_season_start_year(training_df['ds']).unique())
+    config = json.dumps(get_model_config(model), sort_keys=True, default=str)
+
+    folds = []
+    # 最初のシーズンは学習データがないため除く
+    for season_year in season_years[1:][-seasons:]:
+        cutoff = pd.Timestamp(season_year, 11, 1)
+        history = historical_df[historical_df['ds'] < cutoff]
+        train = training_df[training_df['ds'] < cutoff]
+        actual = observed_df[
+            (observed_df['ds'] >= cutoff) & (observed_df['ds'] < pd.Timestamp(season_year + 1, 5, 1))
+        ]
+        if train.empty or actual.empty:
+            continue
+
+        hasher = hashlib.sha1(config.encode())
+        hasher.update(pd.util.hash_pandas_object(history, index=False).values.tobytes())
+        hasher.update(pd.util.hash_pandas_object(train, index=False).values.tobytes())
+        hasher.update(pd.util.hash_pandas_object(actual, index=False).values.tobytes())
+        folds.append({
+            'cutoff': cutoff,
+            'season': f'{season_year}-{season_year + 1}',
+            'data_hash': hasher.hexdigest(),
+            'history': history,
+            'train': train,
+            'actual': actual,
+        })
+    return folds
+
+
+def run_fold(template_model, fold):
+    """1つの fold を学習・予測する（プロセスプールで実行）"""
+    model = prophet_copy(template_model)
+    # 評価には点予測のみ使用するため不確実性区間のサンプリングは行わない
+    model.uncertainty_samples = 0
+    model.fit(fold['train'])
+
+    future_df = create_future_dataframe(model, fold['history'])
+    forecast = model.predict(future_df)[['ds', 'yhat']]
+    predictions = fold['actual'].merge(forecast, on='ds', how='left')
+
+    return {
+        'model_json': model_to_json(model),
+        'predictions': [
+            {
+                'date': row.ds.strftime('%Y-%m'),
+                'actual': float(row.y),
+                'predicted': max(float(row.yhat), 0.0),
+            }
+            for row in predictions.itertuples(index=False)
+        ],
+    }
+
+
+def run_folds(tasks, jobs):
+    """(テンプレートモデル, fold) の一覧をプロセスプールで並列に実行"""
+    if jobs == 1:
+        return [run_fold(model, fold) for model, fold in tasks]
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_fold, model, fold) for model, fold in tasks]
+        return [future.result() for future in futures]
+
+
+def calculate_metrics(predictions):
+    """予測結果から月別・シーズン別の MAE/MAPE を計算"""
+    df = pd.DataFrame(predictions)
+    df['ds'] = pd.to_datetime(df['date'])
+    df['month'] = df['ds'].dt.month
+    df['abs_error'] = (df['predicted'] - df['actual']).abs()
+    # 実測値が0の月は MAPE を定義できないため除外
+    df['ape'] = np.where(df['actual'] > 0, df['abs_error'] / df['actual'].where(df['actual'] > 0), np.nan)
+
+    metrics = []
+    for scope, key in [('month', 'month'), ('season', 'season')]:
+        grouped = df.groupby(key).agg(
+            mae=('abs_error', 'mean'), mape=('ape', 'mean'), n=('abs_error', 'size')
+        )
+        for label, row in grouped.iterrows():
+            metrics.append({
+                'scope': scope,
+                'label': str(label),
+                'mae': float(row['mae']),
+                'mape': float(row['mape'] * 100) if pd.notna(row['mape']) else None,
+                'n': int(row['n']),
+            })
+    return metrics
@@ -0,0 +1,74 @@
+from django.db import transaction
+
+from .models import ResortClimatology
+from .utils import WINTER_MONTHS, load_csv_data, get_file_signature
+
+CLIMATOLOGY_FIELDS = [
+    'mean', 'median', 'p10', 'p90', 'record', 'record_date', 'first_year', 'last_year', 'n',
+]
+
+
+def calculate_climatology(historical_df):
+    """全期間の観測データから冬季の月別統計（平均・中央値・P10/P90・最大記録）を計算"""
+    df = historical_df[historical_df['ds'].dt.month.isin(WINTER_MONTHS)].dropna(subset=['y'])
+    grouped = df.groupby(df['ds'].dt.month)
+
+    stats = grouped['y'].agg(mean='mean', median='median', record='max', n='size')
+    quantiles = grouped['y'].quantile([0.1, 0.9]).unstack()
+    stats['p10'] = quantiles[0.1]
+    stats['p90'] = quantiles[0.9]
+    # 最大記録が複数ある場合は最も古い年月
+    stats['record_date'] = df.loc[grouped['y'].idxmax(), 'ds'].dt.date.to_numpy()
+    stats['first_year'] = grouped['ds'].min().dt.year
+    stats['last_year'] = grouped['ds'].max().dt.year
+    return stats.reindex([month for month in WINTER_MONTHS if month in stats.index])
+
+
+@transaction.atomic
+def refresh_climatology(resort, historical_df=None):
+    """スキー場の長期統計を再計算して保存（CSVがない場合は None）"""
+    data_version = get_file_signature(resort.csv_file)
+    if historical_df is None:
+        historical_df = load_csv_data(resort.csv_file)
+    if historical_df is None:
+        return None
+
+    stats = calculate_climatology(historical_df)
+    rows = [
+        ResortClimatology(
+            resort=resort,
+            month=int(row.Index),
+            mean=float(row.mean),
+            median=float(row.median),
+            p10=float(row.p10),
+            p90=float(row.p90),
+            record=float(row.record),
+            record_date=row.record_date,
+            first_year=int(row.first_year),
+            last_year=int(row.last_year),
+            n=int(row.n),
+            data_version=data_version,
+        )
+        for row in stats.itertuples()
+    ]
+    ResortClimatology.objects.filter(resort=resort).exclude(month__in=stats.index.tolist()).delete()
+    ResortClimatology.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['resort', 'month'],
+        update_fields=CLIMATOLOGY_FIELDS + ['data_version', 'updated_at'],
+    )
+    return rows
+
+
+def get_climatology(resort):
+    """スキー場の長期統計を取得（CSVが更新されていれば再計算する）"""
+    rows = list(ResortClimatology.objects.filter(resort=resort))
+    data_version = get_file_signature(resort.csv_file)
+    if not rows or any(row.data_version != data_version for row in rows):
+        refreshed = refresh_climatology(resort)
+        if refreshed is not None:
+            rows = refreshed
+
+    order = {month: i for i, month in enumerate(WINTER_MONTHS)}
+    return sorted(rows, key=lambda row: order.get(row.month, len(order)))
@@ -0,0 +1,123 @@
+import csv
+import json
+import zlib
+
+import pandas as pd
+
+from .admission import AdmissionRejected
+from .forecasting import ForecastDataNotFound, compute_forecast, get_forecast_or_stale
+
+EXPORT_FIELDS = ['resort', 'date', 'kind', 'actual', 'yhat', 'yhat_lower', 'yhat_upper']
+
+
+class Echo:
+    """csv.writer の出力をそのまま返す疑似バッファ"""
+
+    def write(self, value):
+        return value
+
+
+def _to_value(value):
+    """NaN を None に変換して丸める"""
+    if value is None or value != value:
+        return None
+    return round(float(value), 1)
+
+
+def iter_resort_forecasts(resorts):
+    """スキー場ごとに (スキー場, 予測結果) を生成（モデル・CSVがないスキー場は除く）
+
+    混雑時は古い予測を使い、それもなければ同時実行数の制限を通さずに計算する。
+    ストリーミングの送信開始後は 503 を返せず、途中で終えると不完全なファイルになるため。
+    """
+    for resort in resorts:
+        try:
+            try:
+                result = get_forecast_or_stale(resort)
+            except AdmissionRejected:
+                result = compute_forecast(resort)
+        except ForecastDataNotFound:
+            continue
+        yield resort, result
+
+
+def iter_export_rows(forecasts, start=None, end=None):
+    """スキー場ごとに履歴データと予測データを1行ずつ生成
+
+    forecasts に iter_resort_forecasts をそのまま渡すと1スキー場分のデータのみを保持するため、
+    対象が増えてもメモリ使用量は一定。
+    """
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    for resort, result in forecasts:
+        history = result['historical_df'][['ds', 'y']]
+        forecast = result['future_forecast'][['ds', 'yhat', 'yhat_lower', 'yhat_upper']]
+        if start is not None:
+            history = history[history['ds'] >= start]
+            forecast = forecast[forecast['ds'] >= start]
+        if end is not None:
+            history = history[history['ds'] <= end]
+            forecast = forecast[forecast['ds'] <= end]
+
+        for ds, y in history.itertuples(index=False):
+            yield {
+                'resort': resort.name,
+                'date': ds.strftime('%Y-%m'),
+                'kind': 'history',
+                'actual': _to_value(y),
+                'yhat': None,
+                'yhat_lower': None,
+                'yhat_upper': None,
+            }
+
+        for ds, yhat, yhat_lower, yhat_upper in forecast.itertuples(index=False):
+            yield {
+                'resort': resort.name,
+                'date': ds.strftime('%Y-%m'),
+                'kind': 'forecast',
+                'actual': None,
+                'yhat': _to_value(yhat),
+                'yhat_lower': _to_value(yhat_lower),
+                'yhat_upper': _to_value(yhat_upper),
+            }
+
+
+def iter_csv(rows):
+    """行データを CSV 形式で逐次出力"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS).encode('utf-8')
+    for row in rows:
+        values = ['' if row[field] is None else row[field] for field in EXPORT_FIELDS]
+        yield writer.writerow(values).encode('utf-8')
+
+
+def iter_ndjson(rows):
+    """行データを NDJSON 形式で逐次出力"""
+    for row in rows:
+        yield (json.dumps(row, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def iter_gzip(chunks):
+    """バイト列を逐次 gzip 圧縮"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson; charset=utf-8'),
+}
+
+
+def iter_export(forecasts, export_format='csv', start=None, end=None, compress=False):
+    """(スキー場, 予測結果) の並びからエクスポート用のバイト列ストリームを作成"""
+    formatter, _ = EXPORT_FORMATS[export_format]
+    chunks = formatter(iter_export_rows(forecasts, start, end))
+    if compress:
+        chunks = iter_gzip(chunks)
+    return chunks
@@ -0,0 +1,92 @@
+from django.conf import settings
+
+from .admission import AdmissionLimiter, AdmissionRejected
+from .singleflight import SingleFlight
+from .utils import (
+    ALL_MONTHS, load_model, load_csv_data, get_data_version, create_prediction_data,
+    create_regressor_terms, create_scenario_data,
+)
+
+# キャッシュする予測結果の形式が変わった場合はキーのバージョンを上げる
+FORECAST_CACHE_KEY = 'forecast:v4:{resort_id}'
+
+forecast_flight = SingleFlight(
+    fresh_timeout=getattr(settings, 'SNOW_DEEP_FORECAST_CACHE_TIMEOUT', 3600),
+    stale_timeout=getattr(settings, 'SNOW_DEEP_FORECAST_STALE_TIMEOUT', 86400),
+    lock_timeout=getattr(settings, 'SNOW_DEEP_FORECAST_LOCK_TIMEOUT', 30),
+    wait_timeout=getattr(settings, 'SNOW_DEEP_FORECAST_WAIT_TIMEOUT', 25),
+)
+
+predict_limiter = AdmissionLimiter(
+    max_concurrency=getattr(settings, 'SNOW_DEEP_PREDICT_MAX_CONCURRENCY', 1),
+    max_queue=getattr(settings, 'SNOW_DEEP_PREDICT_QUEUE_DEPTH', 4),
+    queue_timeout=getattr(settings, 'SNOW_DEEP_PREDICT_QUEUE_TIMEOUT', 5),
+    retry_after=getattr(settings, 'SNOW_DEEP_PREDICT_RETRY_AFTER', 5),
+)
+
+
+class ForecastDataNotFound(Exception):
+    """モデルまたはCSVファイルが存在しない"""
+
+
+def compute_forecast(resort):
+    """スキー場の全月分の予測を計算"""
+    # 読み込み前に取得し、計算途中でファイルが更新された場合は古いバージョンとして扱う
+    data_version = get_data_version([resort])
+    model = load_model(resort.model_file)
+    historical_df = load_csv_data(resort.csv_file)
+
+    if model is None or historical_df is None:
+        raise ForecastDataNotFound(f'{resort.name}のモデルまたはCSVファイルが見つかりません。')
+
+    future_forecast, full_forecast, historical_df = create_prediction_data(
+        model, historical_df, ALL_MONTHS
+    )
+    regressor_terms = create_regressor_terms(model, historical_df, full_forecast)
+    return {
+        'data_version': data_version,
+        'future_forecast': future_forecast,
+        'full_forecast': full_forecast,
+        'historical_df': historical_df,
+        'regressor_terms': regressor_terms,
+        'scenarios': create_scenario_data(model, historical_df, full_forecast, regressor_terms),
+    }
+
+
+def _admitted_compute_forecast(resort):
+    """同時実行数の制限内で予測を計算"""
+    with predict_limiter.admit():
+        return compute_forecast(resort)
+
+
+def get_forecast(resort, allow_stale=True):
+    """スキー場の予測を取得（同時リクエストは1回の計算にまとめる）
+
+    先行リクエストの計算を待ちきれなかった場合も、混雑として AdmissionRejected を送出する。
+    """
+    try:
+        return forecast_flight.do(
+            FORECAST_CACHE_KEY.format(resort_id=resort.pk),
+            get_data_version([resort]),
+            lambda: _admitted_compute_forecast(resort),
+            allow_stale
+        )
+    except TimeoutError:
+        raise predict_limiter.reject('flight_timeout')
+
+
+def get_forecast_or_stale(resort):
+    """予測を取得（混雑時は古い予測があればそれを返し、なければ AdmissionRejected）"""
+    try:
+        return get_forecast(resort)
+    except AdmissionRejected:
+        result = get_stale_forecast(resort)
+        if result is None:
+            raise
+        predict_limiter.record_stale()
+        return result
+
+
+def get_stale_forecast(resort):
+    """キャッシュ済みの予測を鮮度を問わず取得"""
+    return forecast_flight.get_stale(FORECAST_CACHE_KEY.format(resort_id=resort.pk))
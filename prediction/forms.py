@@ -1,3 +1,5 @@
+import math
+
 from django import forms
 from .models import SkiResort
 
@@ -37,3 +39,198 @@ class PredictionForm(forms.Form):
         # デフォルトで全ての月を選択
         if not self.data:
             self.fields['months'].initial = [11, 12, 1, 2, 3, 4]
+
+
+class ForecastForm(forms.Form):
+    """全ての冬季月の予測を取得（GET）"""
+    resort = forms.ModelChoiceField(
+        queryset=SkiResort.objects.all(),
+        label="スキー場"
+    )
+
+
+class ClimatologyForm(forms.Form):
+    resort = forms.ModelChoiceField(
+        queryset=SkiResort.objects.all(),
+        label="スキー場"
+    )
+
+
+RANKING_STATISTIC_CHOICES = [
+    ('depth', '予測積雪量'),
+    ('deviation', '10シーズン平均との差'),
+]
+
+
+class RankingForm(forms.Form):
+    months = forms.TypedMultipleChoiceField(
+        choices=MONTH_CHOICES,
+        coerce=int,
+        required=False,
+        label="対象月"
+    )
+
+    by = forms.ChoiceField(
+        choices=RANKING_STATISTIC_CHOICES,
+        required=False,
+        label="ランキング基準"
+    )
+
+    top = forms.IntegerField(
+        min_value=1,
+        required=False,
+        label="上位件数"
+    )
+
+    def clean_months(self):
+        # 未指定の場合は全ての月を対象にする
+        return self.cleaned_data['months'] or [month for month, _ in MONTH_CHOICES]
+
+    def clean_by(self):
+        return self.cleaned_data['by'] or 'depth'
+
+
+EXPORT_FORMAT_CHOICES = [
+    ('csv', 'CSV'),
+    ('ndjson', 'NDJSON'),
+]
+
+
+class ExportForm(forms.Form):
+    resort = forms.ModelMultipleChoiceField(
+        queryset=SkiResort.objects.all(),
+        required=False,
+        label="スキー場"
+    )
+
+    start = forms.DateField(
+        input_formats=['%Y-%m', '%Y-%m-%d'],
+        required=False,
+        label="開始年月"
+    )
+
+    end = forms.DateField(
+        input_formats=['%Y-%m', '%Y-%m-%d'],
+        required=False,
+        label="終了年月"
+    )
+
+    format = forms.ChoiceField(
+        choices=EXPORT_FORMAT_CHOICES,
+        required=False,
+        label="出力形式"
+    )
+
+    gzip = forms.BooleanField(
+        required=False,
+        label="gzip圧縮"
+    )
+
+    def clean_resort(self):
+        # 未指定の場合は全てのスキー場を対象にする
+        return self.cleaned_data['resort'] or SkiResort.objects.all()
+
+    def clean_format(self):
+        return self.cleaned_data['format'] or 'csv'
+
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('start')
+        end = cleaned_data.get('end')
+        if start and end and start > end:
+            raise forms.ValidationError("開始年月は終了年月より前を指定してください。")
+        return cleaned_data
+
+
+WHATIF_MODE_CHOICES = [
+    ('delta', '平年値からの増減'),
+    ('value', '値を指定'),
+]
+
+# リグレッサー（気温・日数）の上書きに指定できる値の絶対値の上限
+WHATIF_VALUE_LIMIT = 1000
+
+
+class WhatIfForm(forms.Form):
+    resort = forms.ModelChoiceField(
+        queryset=SkiResort.objects.all(),
+        label="スキー場"
+    )
+
+    months = forms.TypedMultipleChoiceField(
+        choices=MONTH_CHOICES,
+        coerce=int,
+        required=False,
+        label="対象月"
+    )
+
+    overrides = forms.JSONField(
+        required=False,
+        label="リグレッサーの上書き",
+        help_text='{"月": {"リグレッサー名": 値}} の形式'
+    )
+
+    mode = forms.ChoiceField(
+        choices=WHATIF_MODE_CHOICES,
+        required=False,
+        label="上書き方法"
+    )
+
+    def clean_months(self):
+        # 未指定の場合は全ての月を対象にする
+        return self.cleaned_data['months'] or [month for month, _ in MONTH_CHOICES]
+
+    def clean_mode(self):
+        return self.cleaned_data['mode'] or 'delta'
+
+    def clean_overrides(self):
+        overrides = self.cleaned_data['overrides'] or {}
+        if not isinstance(overrides, dict):
+            raise forms.ValidationError("月ごとのオブジェクトで指定してください。")
+
+        valid_months = {month for month, _ in MONTH_CHOICES}
+        cleaned = {}
+        try:
+            for month, values in overrides.items():
+                month = int(month)
+                if month not in valid_months or not isinstance(values, dict):
+                    raise ValueError
+                cleaned[month] = {str(name): float(value) for name, value in values.items()}
+        except (TypeError, ValueError):
+            raise forms.ValidationError("上書きの形式が正しくありません。")
+
+        for values in cleaned.values():
+            for value in values.values():
+                if not math.isfinite(value) or abs(value) > WHATIF_VALUE_LIMIT:
+                    raise forms.ValidationError(
+                        f"上書きの値は -{WHATIF_VALUE_LIMIT} から {WHATIF_VALUE_LIMIT} の範囲で指定してください。"
+                    )
+        return cleaned
+
+
+MEMORY_PROFILE_ACTION_CHOICES = [
+    ('diff', '基準からの差分'),
+    ('start', '計測開始'),
+    ('reset', '差分を返して基準を更新'),
+    ('stop', '計測終了'),
+]
+
+
+class MemoryProfileForm(forms.Form):
+    action = forms.ChoiceField(
+        choices=MEMORY_PROFILE_ACTION_CHOICES,
+        required=False,
+        label="操作"
+    )
+
+    top = forms.IntegerField(
+        min_value=1,
+        required=False,
+        label="表示するモジュール数"
+    )
+
+    def clean_action(self):
+        return self.cleaned_data['action'] or 'diff'
+
+    def clean_top(self):
+        return self.cleaned_data['top'] or 20
@@ -0,0 +1,91 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from prediction.backtest import make_folds, run_folds, calculate_metrics
+from prediction.models import SkiResort, BacktestFold, BacktestResult
+from prediction.utils import load_model, load_csv_data
+
+
+class Command(BaseCommand):
+    help = '過去の冬季シーズンでローリングオリジン評価を行い、MAE/MAPE を保存します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resort', action='append', default=[], help='対象スキー場ID（複数指定可）')
+        parser.add_argument('--seasons', type=int, default=10, help='評価する直近のシーズン数')
+        parser.add_argument('--jobs', type=int, default=os.cpu_count(), help='並列プロセス数')
+        parser.add_argument('--force', action='store_true', help='キャッシュ済みの fold も再計算する')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        resorts = SkiResort.objects.order_by('pk')
+        if options['resort']:
+            resorts = resorts.filter(pk__in=options['resort'])
+
+        # 全スキー場の fold を集め、キャッシュがないものだけを並列に計算する
+        resort_folds = []
+        tasks = []
+        for resort in resorts:
+            model = load_model(resort.model_file)
+            historical_df = load_csv_data(resort.csv_file)
+            if model is None or historical_df is None:
+                self.stdout.write(self.style.WARNING(f'{resort.name}: モデルまたはCSVがないためスキップ'))
+                continue
+
+            cached = {
+                fold.cutoff: fold
+                for fold in BacktestFold.objects.filter(resort=resort).defer('model_json')
+            }
+            folds = make_folds(model, historical_df, options['seasons'])
+            for fold in folds:
+                cached_fold = cached.get(fold['cutoff'].date())
+                if cached_fold is not None and cached_fold.data_hash == fold['data_hash'] and not options['force']:
+                    fold['predictions'] = cached_fold.predictions
+                else:
+                    tasks.append((model, fold))
+            resort_folds.append((resort, folds))
+
+        self.stdout.write(f'新規 fold: {len(tasks)}件（{options["jobs"]}プロセスで実行）')
+        for (_, fold), result in zip(tasks, run_folds(tasks, options['jobs'])):
+            fold['predictions'] = result['predictions']
+            fold['model_json'] = result['model_json']
+
+        for resort, folds in resort_folds:
+            self.save_results(resort, folds)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'バックテスト完了: {len(resort_folds)}スキー場, {time.monotonic() - started:.1f}秒'
+        ))
+
+    @transaction.atomic
+    def save_results(self, resort, folds):
+        for fold in folds:
+            if 'model_json' in fold:
+                BacktestFold.objects.update_or_create(
+                    resort=resort,
+                    cutoff=fold['cutoff'].date(),
+                    defaults={
+                        'season': fold['season'],
+                        'data_hash': fold['data_hash'],
+                        'model_json': fold['model_json'],
+                        'predictions': fold['predictions'],
+                    }
+                )
+
+        predictions = [
+            {**prediction, 'season': fold['season']}
+            for fold in folds for prediction in fold['predictions']
+        ]
+        if not predictions:
+            return
+
+        metrics = calculate_metrics(predictions)
+        BacktestResult.objects.filter(resort=resort).delete()
+        BacktestResult.objects.bulk_create([
+            BacktestResult(resort=resort, **metric) for metric in metrics
+        ])
+
+        month_mae = {m['label']: m['mae'] for m in metrics if m['scope'] == 'month'}
+        summary = ', '.join(f'{month}月 {month_mae[str(month)]:.1f}' for month in [11, 12, 1, 2, 3, 4] if str(month) in month_mae)
+        self.stdout.write(f'{resort.name}: MAE(cm) {summary}')
@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from prediction.models import Prediction
+from prediction.retention import compact_batch
+
+
+class Command(BaseCommand):
+    help = '保持期間を過ぎた予測結果ログを日別・スキー場別に集計し、バッチ単位で削除します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int,
+            default=getattr(settings, 'SNOW_DEEP_PREDICTION_RETENTION_DAYS', 30),
+            help='ログを保持する日数'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='1トランザクションで処理する件数')
+        parser.add_argument('--sleep', type=float, default=0, help='バッチ間の待機秒数（本番DBの負荷調整用）')
+        parser.add_argument('--dry-run', action='store_true', help='対象件数のみ表示する')
+
+    def handle(self, *args, **options):
+        if options['days'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--days と --batch-size は1以上を指定してください。')
+
+        # 日単位で集計するため、保持期間の境界は日付の切り替わりに揃える
+        cutoff = timezone.localtime().replace(hour=0, minute=0, second=0, microsecond=0)
+        cutoff -= timedelta(days=options['days'])
+
+        if options['dry_run']:
+            count = Prediction.objects.filter(created_at__lt=cutoff).count()
+            self.stdout.write(f'{cutoff:%Y-%m-%d %H:%M} より前のログ: {count}件')
+            return
+
+        started = time.monotonic()
+        total = 0
+        while True:
+            processed = compact_batch(cutoff, options['batch_size'])
+            if not processed:
+                break
+            total += processed
+            self.stdout.write(f'{total}件を集計・削除しました')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'予測結果ログの圧縮完了: {cutoff:%Y-%m-%d} より前の{total}件, '
+            f'{time.monotonic() - started:.1f}秒'
+        ))
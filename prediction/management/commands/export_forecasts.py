@@ -0,0 +1,54 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from prediction.export import EXPORT_FORMATS, iter_export, iter_resort_forecasts
+from prediction.forms import ExportForm
+
+
+class Command(BaseCommand):
+    help = '予測データと履歴データを CSV/NDJSON で一括エクスポートします'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resort', action='append', default=[],
+            help='対象スキー場ID（複数指定可、未指定時は全スキー場）'
+        )
+        parser.add_argument('--start', help='開始年月 (YYYY-MM)')
+        parser.add_argument('--end', help='終了年月 (YYYY-MM)')
+        parser.add_argument(
+            '--format', choices=list(EXPORT_FORMATS), default='csv',
+            help='出力形式'
+        )
+        parser.add_argument('--gzip', action='store_true', help='gzip圧縮して出力')
+        parser.add_argument('--output', help='出力ファイルパス（未指定時は標準出力）')
+
+    def handle(self, *args, **options):
+        form = ExportForm({
+            'resort': options['resort'],
+            'start': options['start'],
+            'end': options['end'],
+            'format': options['format'],
+            'gzip': options['gzip'],
+        })
+        if not form.is_valid():
+            raise CommandError(form.errors.as_text())
+
+        chunks = iter_export(
+            iter_resort_forecasts(list(form.cleaned_data['resort'].order_by('pk'))),
+            form.cleaned_data['format'],
+            form.cleaned_data['start'],
+            form.cleaned_data['end'],
+            form.cleaned_data['gzip']
+        )
+
+        if options['output']:
+            with open(options['output'], 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+            self.stderr.write(
+                self.style.SUCCESS(f'エクスポート完了: {options["output"]}')
+            )
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
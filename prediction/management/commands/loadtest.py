@@ -0,0 +1,277 @@
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from prediction.memory import read_rss_mb
+from prediction.models import SkiResort
+
+WORKER_CLASSES = ['sync', 'gthread', 'gevent', 'eventlet']
+
+
+def child_pids(pid):
+    """子プロセス（gunicorn ワーカー）の PID 一覧"""
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def find_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = 'gunicorn をローカル起動して負荷試験を行い、結果を JSON で出力します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--worker-class', choices=WORKER_CLASSES, default='sync',
+            help='gunicorn のワーカークラス'
+        )
+        parser.add_argument('--workers', type=int, default=2, help='ワーカープロセス数')
+        parser.add_argument('--threads', type=int, default=1, help='ワーカーあたりのスレッド数 (gthread)')
+        parser.add_argument(
+            '--preload', action=argparse.BooleanOptionalAction, default=True,
+            help='本番設定と同じくアプリケーションをフォーク前に読み込む（--no-preload で無効）'
+        )
+        parser.add_argument('--concurrency', type=int, default=8, help='同時接続数')
+        parser.add_argument('--duration', type=float, default=30, help='計測時間（秒）')
+        parser.add_argument('--warmup', type=float, default=3, help='計測前のウォームアップ時間（秒）')
+        parser.add_argument(
+            '--mix', default='index=1,predict=4,health=1',
+            help='リクエスト比率 (例: index=1,predict=4,health=1)'
+        )
+        parser.add_argument(
+            '--revalidate', type=float, default=0.5,
+            help='予測リクエストのうち If-None-Match でブラウザのキャッシュを再検証する割合 (0-1)'
+        )
+        parser.add_argument('--timeout', type=float, default=30, help='リクエストのタイムアウト（秒）')
+        parser.add_argument('--output', help='レポートの出力先（未指定時は標準出力）')
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        if not 0 <= options['revalidate'] <= 1:
+            raise CommandError('--revalidate は 0 から 1 の範囲で指定してください。')
+
+        resort_ids = list(SkiResort.objects.values_list('pk', flat=True))
+        if 'predict' in mix and not resort_ids:
+            raise CommandError('スキー場が登録されていません。setup_resorts を実行してください。')
+
+        port = find_free_port()
+        base_url = f'http://127.0.0.1:{port}'
+        server = self.start_server(options, port)
+
+        try:
+            self.wait_until_ready(server, base_url)
+            etags = self.fetch_etags(base_url, resort_ids) if 'predict' in mix else {}
+
+            def make_request():
+                kind = random.choices(list(mix), weights=list(mix.values()))[0]
+                if kind == 'predict':
+                    # ブラウザと同じく全ての冬季月を GET で取得し、一部はキャッシュ済みの ETag で再検証する
+                    resort_id = random.choice(resort_ids)
+                    headers = {}
+                    if resort_id in etags and random.random() < options['revalidate']:
+                        headers['If-None-Match'] = etags[resort_id]
+                    request = urllib.request.Request(
+                        f'{base_url}/predict/?' + urllib.parse.urlencode({'resort': resort_id}),
+                        headers=headers
+                    )
+                else:
+                    path = '/' if kind == 'index' else f'/{kind}/'
+                    request = urllib.request.Request(f'{base_url}{path}')
+                return kind, request
+
+            self.run_load(make_request, options['concurrency'], options['warmup'], options['timeout'])
+            rss_sampler = RssSampler(server.pid)
+            rss_sampler.start()
+            started = time.monotonic()
+            results = self.run_load(make_request, options['concurrency'], options['duration'], options['timeout'])
+            elapsed = time.monotonic() - started
+            rss_sampler.stop()
+        finally:
+            server.terminate()
+            try:
+                server.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                server.kill()
+
+        report = self.build_report(options, mix, results, elapsed, rss_sampler)
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+            self.stderr.write(self.style.SUCCESS(f'レポートを出力しました: {options["output"]}'))
+        else:
+            self.stdout.write(output)
+
+    def parse_mix(self, value):
+        mix = {}
+        for item in value.split(','):
+            kind, _, weight = item.partition('=')
+            if kind not in ('index', 'predict', 'health', 'ranking'):
+                raise CommandError(f'不明なリクエスト種別です: {kind}')
+            mix[kind] = float(weight or 1)
+        return mix
+
+    def start_server(self, options, port):
+        command = [
+            sys.executable, '-m', 'gunicorn', 'snow_predict.wsgi:application',
+            '--bind', f'127.0.0.1:{port}',
+            '--worker-class', options['worker_class'],
+            '--workers', str(options['workers']),
+            '--threads', str(options['threads']),
+            '--timeout', '30',
+            '--log-level', 'warning',
+        ]
+        if options['preload']:
+            command.append('--preload')
+        # DEBUG ではクエリの記録などでメモリ・スループットが本番と異なるため無効にする
+        env = {**os.environ, 'DJANGO_DEBUG': 'False'}
+        return subprocess.Popen(command, cwd=settings.BASE_DIR, env=env)
+
+    def wait_until_ready(self, server, base_url, timeout=60):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError('gunicorn の起動に失敗しました。')
+            try:
+                with urllib.request.urlopen(f'{base_url}/health/', timeout=5):
+                    return
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.5)
+        raise CommandError('gunicorn の起動がタイムアウトしました。')
+
+    def fetch_etags(self, base_url, resort_ids):
+        """スキー場ごとの予測レスポンスの ETag（再検証リクエスト用）"""
+        etags = {}
+        for resort_id in resort_ids:
+            url = f'{base_url}/predict/?' + urllib.parse.urlencode({'resort': resort_id})
+            try:
+                with urllib.request.urlopen(url, timeout=60) as response:
+                    response.read()
+                    if response.headers.get('ETag'):
+                        etags[resort_id] = response.headers['ETag']
+            except urllib.error.HTTPError:
+                continue
+        return etags
+
+    def run_load(self, make_request, concurrency, duration, timeout):
+        """指定時間、同時接続数を保ってリクエストを送り続ける"""
+        deadline = time.monotonic() + duration
+
+        def worker():
+            samples = []
+            while time.monotonic() < deadline:
+                kind, request = make_request()
+                started = time.monotonic()
+                try:
+                    with urllib.request.urlopen(request, timeout=timeout) as response:
+                        response.read()
+                        status = response.status
+                except urllib.error.HTTPError as e:
+                    status = e.code
+                except (urllib.error.URLError, ConnectionError, TimeoutError):
+                    status = None
+                samples.append((kind, time.monotonic() - started, status))
+            return samples
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(worker) for _ in range(concurrency)]
+            return [sample for future in futures for sample in future.result()]
+
+    def summarize(self, samples, elapsed):
+        if not samples:
+            return {'requests': 0}
+        latencies = np.array([latency for _, latency, _ in samples]) * 1000
+        errors = sum(1 for _, _, status in samples if status is None or status >= 400)
+        return {
+            'requests': len(samples),
+            'throughput_rps': round(len(samples) / elapsed, 2),
+            'error_rate': round(errors / len(samples), 4),
+            'not_modified': sum(1 for _, _, status in samples if status == 304),
+            'latency_ms': {
+                'mean': round(float(latencies.mean()), 1),
+                'p50': round(float(np.percentile(latencies, 50)), 1),
+                'p95': round(float(np.percentile(latencies, 95)), 1),
+                'p99': round(float(np.percentile(latencies, 99)), 1),
+                'max': round(float(latencies.max()), 1),
+            },
+        }
+
+    def build_report(self, options, mix, results, elapsed, rss_sampler):
+        return {
+            'config': {
+                'worker_class': options['worker_class'],
+                'workers': options['workers'],
+                'threads': options['threads'],
+                'preload': options['preload'],
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+                'mix': mix,
+                'revalidate': options['revalidate'],
+                'cpu_count': os.cpu_count(),
+            },
+            'elapsed': round(elapsed, 2),
+            **self.summarize(results, elapsed),
+            'endpoints': {
+                kind: self.summarize([s for s in results if s[0] == kind], elapsed)
+                for kind in mix
+            },
+            'memory': rss_sampler.report(),
+        }
+
+
+class RssSampler:
+    """gunicorn マスター・ワーカーの RSS を定期的に記録"""
+
+    def __init__(self, master_pid, interval=0.5):
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peak = {}
+        self.last = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            for pid in [self.master_pid] + child_pids(self.master_pid):
+                rss = read_rss_mb(pid)
+                if rss is not None:
+                    self.last[pid] = rss
+                    self.peak[pid] = max(self.peak.get(pid, 0), rss)
+            self._stop.wait(self.interval)
+
+    def report(self):
+        workers = [
+            {'pid': pid, 'rss_mb': round(self.last[pid], 1), 'peak_rss_mb': round(self.peak[pid], 1)}
+            for pid in self.last if pid != self.master_pid
+        ]
+        return {
+            'master_rss_mb': round(self.last.get(self.master_pid, 0), 1),
+            'workers': workers,
+            'total_worker_rss_mb': round(sum(worker['rss_mb'] for worker in workers), 1),
+        }
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand
+from prediction.models import SkiResort
+from prediction.refit import (
+    get_new_rows, build_training_data, fit_model, get_log_posterior, max_forecast_difference,
+    save_model_atomic,
+)
+from prediction.utils import load_model, load_csv_data
+
+
+class Command(BaseCommand):
+    help = 'CSVに新しい観測データがあるスキー場のモデルを、現在のパラメータを初期値として再学習します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resort', action='append', default=[], help='対象スキー場ID（複数指定可）')
+        parser.add_argument('--force', action='store_true', help='新しいデータがなくても再学習する')
+        parser.add_argument('--full', action='store_true', help='ウォームスタートせずに最初から学習する')
+        parser.add_argument(
+            '--compare-full', action='store_true',
+            help='フル学習も行い、Stan の目的関数（対数事後確率）が大きい方のモデルを採用する'
+        )
+        parser.add_argument(
+            '--max-change', type=float,
+            help='配信中のモデルとの予測値の最大差 (cm) がこの値を超えた場合は置き換えない'
+        )
+        parser.add_argument('--dry-run', action='store_true', help='モデルファイルを置き換えない')
+
+    def handle(self, *args, **options):
+        resorts = SkiResort.objects.order_by('pk')
+        if options['resort']:
+            resorts = resorts.filter(pk__in=options['resort'])
+
+        for resort in resorts:
+            model = load_model(resort.model_file)
+            historical_df = load_csv_data(resort.csv_file)
+            if model is None or historical_df is None:
+                self.stdout.write(self.style.WARNING(f'{resort.name}: モデルまたはCSVがないためスキップ'))
+                continue
+
+            new_rows = get_new_rows(model, historical_df)
+            if new_rows.empty and not options['force']:
+                self.stdout.write(f'{resort.name}: 新しいデータはありません')
+                continue
+
+            # 配信中のモデルの学習データに新しい行を追加して学習する
+            training_df = build_training_data(model, historical_df)
+            new_model, elapsed = fit_model(model, training_df, warm_start=not options['full'])
+            message = f'{resort.name}: 新規{len(new_rows)}行, 学習 {elapsed:.2f}秒'
+
+            if options['compare_full'] and not options['full']:
+                full_model, full_elapsed = fit_model(model, training_df, warm_start=False)
+                warm_lp = get_log_posterior(new_model)
+                full_lp = get_log_posterior(full_model)
+                message += f' (フル学習 {full_elapsed:.2f}秒, 対数事後確率 ウォーム {warm_lp} / フル {full_lp})'
+                # 同じ学習データに対する最適化のため、目的関数が大きい方がより良い解
+                if warm_lp is not None and full_lp is not None and full_lp > warm_lp:
+                    self.stdout.write(f'{resort.name}: フル学習の方が目的関数が大きいため採用します')
+                    new_model = full_model
+
+            change = max_forecast_difference(new_model, model, historical_df)
+            message += f', 配信中モデルとの予測値の最大差 {change:.2f}cm'
+            if options['max_change'] is not None and change > options['max_change']:
+                self.stdout.write(self.style.WARNING(
+                    f'{message} - 許容値 {options["max_change"]}cm を超えたため置き換えません'
+                ))
+                continue
+
+            if not options['dry_run']:
+                # ファイルの更新により予測キャッシュ・ランキングも自動的に再計算される
+                save_model_atomic(new_model, resort.model_file)
+            self.stdout.write(self.style.SUCCESS(message))
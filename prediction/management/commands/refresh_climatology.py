@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from prediction.climatology import refresh_climatology
+from prediction.models import SkiResort, ResortClimatology
+from prediction.utils import get_file_signature
+
+
+class Command(BaseCommand):
+    help = 'CSVデータからスキー場・月別の長期統計を再計算します（CSVが更新されたスキー場のみ）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--resort', action='append', default=[], help='対象スキー場ID（複数指定可）')
+        parser.add_argument('--force', action='store_true', help='CSVが更新されていなくても再計算する')
+
+    def handle(self, *args, **options):
+        resorts = SkiResort.objects.order_by('pk')
+        if options['resort']:
+            resorts = resorts.filter(pk__in=options['resort'])
+
+        versions = {}
+        for resort_id, data_version in ResortClimatology.objects.values_list('resort_id', 'data_version'):
+            versions.setdefault(resort_id, set()).add(data_version)
+
+        refreshed = 0
+        for resort in resorts:
+            if not options['force'] and versions.get(resort.pk) == {get_file_signature(resort.csv_file)}:
+                self.stdout.write(f'{resort.name}: 最新のためスキップ')
+                continue
+
+            rows = refresh_climatology(resort)
+            if rows is None:
+                self.stdout.write(self.style.WARNING(f'{resort.name}: CSVがないためスキップ'))
+                continue
+            refreshed += 1
+            self.stdout.write(f'{resort.name}: {len(rows)}か月分を更新')
+
+        self.stdout.write(self.style.SUCCESS(f'長期統計の更新完了: {refreshed}スキー場'))
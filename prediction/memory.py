@@ -0,0 +1,257 @@
+import collections
+import functools
+import json
+import logging
+import os
+import resource
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+
+from .forecasting import forecast_flight, predict_limiter
+from .utils import _shared_lock, _shared_objects
+
+logger = logging.getLogger(__name__)
+
+
+def read_rss_mb(pid='self'):
+    """/proc からプロセスの RSS (MB) を取得"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """プロセス起動以降の最大 RSS (MB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def estimate_size(obj, depth=3):
+    """オブジェクトのおおよそのメモリ使用量（バイト）
+
+    DataFrame・ndarray は実データの大きさ、それ以外は属性を一定の深さまで辿って合計する。
+    """
+    if isinstance(obj, pd.DataFrame):
+        return int(obj.memory_usage(deep=True).sum())
+    if isinstance(obj, pd.Series):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    size = sys.getsizeof(obj)
+    if depth <= 0:
+        return size
+    if isinstance(obj, dict):
+        return size + sum(estimate_size(value, depth - 1) for value in obj.values())
+    if isinstance(obj, (list, tuple, set)):
+        return size + sum(estimate_size(value, depth - 1) for value in obj)
+    if hasattr(obj, '__dict__'):
+        return size + sum(estimate_size(value, depth - 1) for value in vars(obj).values())
+    return size
+
+
+def cache_sizes():
+    """プロセス内のキャッシュの件数と大きさ"""
+    with _shared_lock:
+        shared = [value for _, value in _shared_objects.values()]
+    sizes = {
+        'shared_objects': {
+            'entries': len(shared),
+            'bytes': sum(estimate_size(value) for value in shared),
+        },
+        'forecast_in_flight': len(forecast_flight._calls),
+    }
+
+    # LocMemCache はプロセス内に pickle 済みの値を保持するため大きさを計測できる
+    entries = getattr(cache, '_cache', None)
+    lock = getattr(cache, '_lock', None)
+    if isinstance(entries, dict) and lock is not None:
+        with lock:
+            values = list(entries.values())
+        sizes['django_cache'] = {
+            'entries': len(values),
+            'bytes': sum(len(value) for value in values if isinstance(value, bytes)),
+        }
+    return sizes
+
+
+class MemorySampler:
+    """ワーカープロセスの RSS・キャッシュサイズを定期的に記録する
+
+    gunicorn の preload_app ではフォーク前に読み込まれるため、
+    サンプリング用スレッドは各ワーカーで最初のリクエスト時に開始する。
+    """
+
+    def __init__(self, interval, history, log_stats=False):
+        self.interval = interval
+        self.log_stats = log_stats
+        self._history = collections.deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._pid = None
+        self._large_growth = 0
+
+    def ensure_started(self):
+        """このプロセスでサンプリングを開始していなければ開始（開始した場合は True）"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return False
+        with self._lock:
+            if self._pid == pid:
+                return False
+            # フォーク前の記録は親プロセスのものなので破棄する
+            self._pid = pid
+            self._history.clear()
+            self._large_growth = 0
+        thread = threading.Thread(target=self._run, name='memory-sampler', daemon=True)
+        thread.start()
+        return True
+
+    def _run(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            sample = self.sample()
+            if self.log_stats:
+                self.log_worker_stats(sample)
+            time.sleep(self.interval)
+
+    def measure(self):
+        """現在の RSS とキャッシュサイズ"""
+        return {
+            'time': round(time.time(), 1),
+            'rss_mb': read_rss_mb(),
+            'caches': cache_sizes(),
+        }
+
+    def sample(self):
+        sample = self.measure()
+        with self._lock:
+            self._history.append(sample)
+        return sample
+
+    def log_worker_stats(self, sample):
+        """ワーカーの負荷状況を1行の JSON でログに出力
+
+        /metrics/ は応答したワーカーの値のみのため、全ワーカーの値は監視側でログから集計する。
+        """
+        logger.info('worker_stats %s', json.dumps({
+            'host': socket.gethostname(),
+            'pid': os.getpid(),
+            'time': sample['time'],
+            'rss_mb': sample['rss_mb'],
+            'admission': predict_limiter.stats(),
+            'large_growth_requests': self._large_growth,
+        }, ensure_ascii=False))
+
+    def record_large_growth(self):
+        """閾値を超えてメモリが増加したリクエストを記録"""
+        with self._lock:
+            self._large_growth += 1
+
+    def stats(self):
+        """現在値・最大値と直近のサンプル"""
+        current = self.measure()
+        with self._lock:
+            history = list(self._history)
+            large_growth = self._large_growth
+        return {
+            'rss_mb': current['rss_mb'],
+            'peak_rss_mb': round(peak_rss_mb(), 1),
+            'caches': current['caches'],
+            'large_growth_requests': large_growth,
+            'rss_history': [[sample['time'], sample['rss_mb']] for sample in history],
+        }
+
+
+@functools.lru_cache(maxsize=4096)
+def module_name(filename):
+    """ファイル名からトップレベルのモジュール名を求める"""
+    for path in sorted(filter(None, sys.path), key=len, reverse=True):
+        path = os.path.join(os.path.abspath(path), '')
+        if filename.startswith(path):
+            relative = filename[len(path):]
+            return relative.split(os.sep)[0].removesuffix('.py')
+    return os.path.basename(filename)
+
+
+class TracemallocProfiler:
+    """tracemalloc のスナップショットを基準と比較し、モジュール別に集計する"""
+
+    def __init__(self, frames=1):
+        self.frames = frames
+        self._baseline = None
+        self._lock = threading.Lock()
+
+    def is_tracing(self):
+        return tracemalloc.is_tracing() and self._baseline is not None
+
+    def start(self):
+        """トレースを開始し、現在の状態を基準とする"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            self._baseline = self._take_snapshot()
+
+    def stop(self):
+        with self._lock:
+            self._baseline = None
+            tracemalloc.stop()
+
+    def diff(self, top=20, reset=False):
+        """基準からの増減をモジュール別に集計（reset の場合は現在を新しい基準にする）"""
+        with self._lock:
+            snapshot = self._take_snapshot()
+            stats = snapshot.compare_to(self._baseline, 'filename')
+            if reset:
+                self._baseline = snapshot
+
+        modules = collections.defaultdict(lambda: {'size_diff': 0, 'size': 0, 'count_diff': 0})
+        for stat in stats:
+            module = modules[module_name(stat.traceback[0].filename)]
+            module['size_diff'] += stat.size_diff
+            module['size'] += stat.size
+            module['count_diff'] += stat.count_diff
+
+        ranked = sorted(modules.items(), key=lambda item: abs(item[1]['size_diff']), reverse=True)
+        return {
+            'traced_mb': round(tracemalloc.get_traced_memory()[0] / 1024 / 1024, 1),
+            'total_diff_kb': round(sum(stat.size_diff for stat in stats) / 1024, 1),
+            'modules': [
+                {
+                    'module': name,
+                    'size_diff_kb': round(values['size_diff'] / 1024, 1),
+                    'size_kb': round(values['size'] / 1024, 1),
+                    'count_diff': values['count_diff'],
+                }
+                for name, values in ranked[:top]
+            ],
+        }
+
+    def _take_snapshot(self):
+        # tracemalloc 自身の確保分は除く
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ])
+
+
+memory_sampler = MemorySampler(
+    interval=getattr(settings, 'SNOW_DEEP_MEMORY_SAMPLE_INTERVAL', 30),
+    history=getattr(settings, 'SNOW_DEEP_MEMORY_SAMPLE_HISTORY', 120),
+    log_stats=getattr(settings, 'SNOW_DEEP_WORKER_STATS_LOG', True),
+)
+
+tracemalloc_profiler = TracemallocProfiler(
+    frames=getattr(settings, 'SNOW_DEEP_TRACEMALLOC_FRAMES', 1),
+)
@@ -0,0 +1,41 @@
+import logging
+
+from django.conf import settings
+
+from .memory import memory_sampler, read_rss_mb, tracemalloc_profiler
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryGrowthMiddleware:
+    """予測リクエストの前後で RSS を計測し、閾値を超えて増加した場合に記録する
+
+    RSS はプロセス全体の値のため、gthread ワーカーでは同時に処理中の
+    他のリクエストの増加分も含まれる。
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = tuple(getattr(settings, 'SNOW_DEEP_MEMORY_LOG_PATHS', ['/predict/']))
+        self.threshold_mb = getattr(settings, 'SNOW_DEEP_MEMORY_LOG_THRESHOLD_MB', 20)
+        self.trace_on_start = getattr(settings, 'SNOW_DEEP_TRACEMALLOC_ON_START', False)
+
+    def __call__(self, request):
+        # ワーカーごとに最初のリクエストで開始する（どのワーカーが応答しても差分を取得できる）
+        if memory_sampler.ensure_started() and self.trace_on_start:
+            tracemalloc_profiler.start()
+        if not request.path.startswith(self.paths):
+            return self.get_response(request)
+
+        before = read_rss_mb()
+        response = self.get_response(request)
+        after = read_rss_mb()
+
+        if before is not None and after is not None and after - before >= self.threshold_mb:
+            memory_sampler.record_large_growth()
+            logger.warning(
+                'メモリ増加 %.1f MB (%.1f MB -> %.1f MB): %s %s status=%s',
+                after - before, before, after,
+                request.method, request.get_full_path(), response.status_code
+            )
+        return response
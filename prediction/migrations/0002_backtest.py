@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BacktestResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('month', '月別'), ('season', 'シーズン別')], max_length=10, verbose_name='集計単位')),
+                ('label', models.CharField(max_length=20, verbose_name='月またはシーズン')),
+                ('mae', models.FloatField(verbose_name='MAE (cm)')),
+                ('mape', models.FloatField(blank=True, null=True, verbose_name='MAPE (%)')),
+                ('n', models.PositiveIntegerField(verbose_name='評価件数')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='prediction.skiresort', verbose_name='スキー場')),
+            ],
+            options={
+                'verbose_name': 'バックテスト結果',
+                'verbose_name_plural': 'バックテスト結果一覧',
+                'ordering': ['resort', 'scope', 'label'],
+            },
+        ),
+        migrations.CreateModel(
+            name='BacktestFold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cutoff', models.DateField(verbose_name='学習データの終了日')),
+                ('season', models.CharField(max_length=9, verbose_name='評価シーズン')),
+                ('data_hash', models.CharField(max_length=40, verbose_name='データハッシュ')),
+                ('model_json', models.TextField(verbose_name='学習済みモデル')),
+                ('predictions', models.JSONField(verbose_name='予測結果')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='prediction.skiresort', verbose_name='スキー場')),
+            ],
+            options={
+                'verbose_name': 'バックテスト fold',
+                'verbose_name_plural': 'バックテスト fold 一覧',
+                'ordering': ['resort', 'cutoff'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='backtestresult',
+            constraint=models.UniqueConstraint(fields=('resort', 'scope', 'label'), name='unique_backtest_result'),
+        ),
+        migrations.AddConstraint(
+            model_name='backtestfold',
+            constraint=models.UniqueConstraint(fields=('resort', 'cutoff'), name='unique_backtest_fold'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0002_backtest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResortClimatology',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='月')),
+                ('mean', models.FloatField(verbose_name='平均 (cm)')),
+                ('median', models.FloatField(verbose_name='中央値 (cm)')),
+                ('p10', models.FloatField(verbose_name='10パーセンタイル (cm)')),
+                ('p90', models.FloatField(verbose_name='90パーセンタイル (cm)')),
+                ('record', models.FloatField(verbose_name='最大記録 (cm)')),
+                ('record_date', models.DateField(verbose_name='最大記録の年月')),
+                ('first_year', models.PositiveSmallIntegerField(verbose_name='集計開始年')),
+                ('last_year', models.PositiveSmallIntegerField(verbose_name='集計終了年')),
+                ('n', models.PositiveIntegerField(verbose_name='観測数')),
+                ('data_version', models.CharField(max_length=255, verbose_name='CSVファイルのシグネチャ')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('resort', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='prediction.skiresort', verbose_name='スキー場')),
+            ],
+            options={
+                'verbose_name': '長期統計',
+                'verbose_name_plural': '長期統計一覧',
+                'ordering': ['resort', 'month'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='resortclimatology',
+            constraint=models.UniqueConstraint(fields=('resort', 'month'), name='unique_resort_climatology'),
+        ),
+    ]
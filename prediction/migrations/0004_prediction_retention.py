@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0003_climatology'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionDailyAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='日付')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='予測回数')),
+                ('month_counts', models.JSONField(default=dict, verbose_name='月別の選択回数')),
+                ('first_at', models.DateTimeField(verbose_name='最初の予測')),
+                ('last_at', models.DateTimeField(verbose_name='最後の予測')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': '予測結果の日別集計',
+                'verbose_name_plural': '予測結果の日別集計一覧',
+                'ordering': ['-date', 'resort'],
+            },
+        ),
+        migrations.AddField(
+            model_name='predictiondailyaggregate',
+            name='resort',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='prediction.skiresort', verbose_name='スキー場'),
+        ),
+        migrations.AddIndex(
+            model_name='predictiondailyaggregate',
+            index=models.Index(fields=['date'], name='prediction_daily_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='predictiondailyaggregate',
+            constraint=models.UniqueConstraint(fields=('resort', 'date'), name='unique_prediction_daily_aggregate'),
+        ),
+    ]
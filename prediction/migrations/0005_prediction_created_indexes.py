@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+class AddIndexConcurrentlyOnPostgres(migrations.AddIndex):
+    """PostgreSQL では CREATE INDEX CONCURRENTLY で作成し、作成中も書き込みをブロックしない
+
+    他のデータベースでは通常の AddIndex として動作する。
+    """
+
+    def _operation(self, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            # psycopg2 のない環境（SQLite）でも読み込めるよう、PostgreSQL の場合のみ import する
+            from django.contrib.postgres.operations import AddIndexConcurrently
+            return AddIndexConcurrently(self.model_name, self.index)
+        return super()
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        self._operation(schema_editor).database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        self._operation(schema_editor).database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY はトランザクション内で実行できない
+    atomic = False
+
+    dependencies = [
+        ('prediction', '0004_prediction_retention'),
+    ]
+
+    operations = [
+        AddIndexConcurrentlyOnPostgres(
+            model_name='prediction',
+            index=models.Index(fields=['created_at'], name='prediction_created_idx'),
+        ),
+        AddIndexConcurrentlyOnPostgres(
+            model_name='prediction',
+            index=models.Index(fields=['resort', 'created_at'], name='prediction_resort_created_idx'),
+        ),
+    ]
@@ -28,6 +28,113 @@ class Prediction(models.Model):
         verbose_name = "予測結果"
         verbose_name_plural = "予測結果一覧"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_at'], name='prediction_created_idx'),
+            models.Index(fields=['resort', 'created_at'], name='prediction_resort_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.resort.name} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+
+class PredictionDailyAggregate(models.Model):
+    """予測結果ログの日別・スキー場別の集計（保持期間を過ぎたログを集約したもの）"""
+    resort = models.ForeignKey(SkiResort, on_delete=models.CASCADE, verbose_name="スキー場")
+    date = models.DateField(verbose_name="日付")
+    count = models.PositiveIntegerField(default=0, verbose_name="予測回数")
+    month_counts = models.JSONField(default=dict, verbose_name="月別の選択回数")
+    first_at = models.DateTimeField(verbose_name="最初の予測")
+    last_at = models.DateTimeField(verbose_name="最後の予測")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "予測結果の日別集計"
+        verbose_name_plural = "予測結果の日別集計一覧"
+        ordering = ['-date', 'resort']
+        constraints = [
+            models.UniqueConstraint(fields=['resort', 'date'], name='unique_prediction_daily_aggregate'),
+        ]
+        indexes = [
+            models.Index(fields=['date'], name='prediction_daily_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.resort.name} - {self.date}"
+
+
+class BacktestFold(models.Model):
+    """バックテストの fold（学習データのハッシュと学習済みパラメータのキャッシュ）"""
+    resort = models.ForeignKey(SkiResort, on_delete=models.CASCADE, verbose_name="スキー場")
+    cutoff = models.DateField(verbose_name="学習データの終了日")
+    season = models.CharField(max_length=9, verbose_name="評価シーズン")
+    data_hash = models.CharField(max_length=40, verbose_name="データハッシュ")
+    model_json = models.TextField(verbose_name="学習済みモデル")
+    predictions = models.JSONField(verbose_name="予測結果")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "バックテスト fold"
+        verbose_name_plural = "バックテスト fold 一覧"
+        ordering = ['resort', 'cutoff']
+        constraints = [
+            models.UniqueConstraint(fields=['resort', 'cutoff'], name='unique_backtest_fold'),
+        ]
+
+    def __str__(self):
+        return f"{self.resort.name} - {self.season}"
+
+
+class BacktestResult(models.Model):
+    """バックテストの評価結果（月別・シーズン別の MAE/MAPE）"""
+    SCOPE_CHOICES = [
+        ('month', '月別'),
+        ('season', 'シーズン別'),
+    ]
+
+    resort = models.ForeignKey(SkiResort, on_delete=models.CASCADE, verbose_name="スキー場")
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES, verbose_name="集計単位")
+    label = models.CharField(max_length=20, verbose_name="月またはシーズン")
+    mae = models.FloatField(verbose_name="MAE (cm)")
+    mape = models.FloatField(null=True, blank=True, verbose_name="MAPE (%)")
+    n = models.PositiveIntegerField(verbose_name="評価件数")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "バックテスト結果"
+        verbose_name_plural = "バックテスト結果一覧"
+        ordering = ['resort', 'scope', 'label']
+        constraints = [
+            models.UniqueConstraint(fields=['resort', 'scope', 'label'], name='unique_backtest_result'),
+        ]
+
+    def __str__(self):
+        return f"{self.resort.name} - {self.get_scope_display()} {self.label}"
+
+
+class ResortClimatology(models.Model):
+    """スキー場・月別の長期統計（全期間の観測データから集計）"""
+    resort = models.ForeignKey(SkiResort, on_delete=models.CASCADE, verbose_name="スキー場")
+    month = models.PositiveSmallIntegerField(verbose_name="月")
+    mean = models.FloatField(verbose_name="平均 (cm)")
+    median = models.FloatField(verbose_name="中央値 (cm)")
+    p10 = models.FloatField(verbose_name="10パーセンタイル (cm)")
+    p90 = models.FloatField(verbose_name="90パーセンタイル (cm)")
+    record = models.FloatField(verbose_name="最大記録 (cm)")
+    record_date = models.DateField(verbose_name="最大記録の年月")
+    first_year = models.PositiveSmallIntegerField(verbose_name="集計開始年")
+    last_year = models.PositiveSmallIntegerField(verbose_name="集計終了年")
+    n = models.PositiveIntegerField(verbose_name="観測数")
+    data_version = models.CharField(max_length=255, verbose_name="CSVファイルのシグネチャ")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "長期統計"
+        verbose_name_plural = "長期統計一覧"
+        ordering = ['resort', 'month']
+        constraints = [
+            models.UniqueConstraint(fields=['resort', 'month'], name='unique_resort_climatology'),
+        ]
+
+    def __str__(self):
+        return f"{self.resort.name} - {self.month}月"
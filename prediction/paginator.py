@@ -0,0 +1,41 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """絞り込みのない大きなテーブルでは件数を統計情報から推定するページネーター
+
+    PostgreSQL の COUNT(*) はテーブル全体を走査するため、pg_class.reltuples の推定値を使う。
+    推定値が小さい場合や絞り込みがある場合、PostgreSQL 以外では通常どおり件数を数える。
+    """
+
+    # 推定値がこの件数未満であれば正確な件数を数える
+    estimate_threshold = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self._estimated_count()
+        if estimate is not None and estimate >= self.estimate_threshold:
+            return estimate
+        return super().count
+
+    def _estimated_count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return None
+
+        connection = connections[self.object_list.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [self.object_list.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # 統計情報が未収集の場合は -1（PostgreSQL 14 以降）または 0
+        if row is None or row[0] <= 0:
+            return None
+        return int(row[0])
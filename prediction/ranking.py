@@ -0,0 +1,134 @@
+import threading
+
+import numpy as np
+from django.core.cache import cache
+
+from .forecasting import ForecastDataNotFound, get_forecast
+from .models import SkiResort
+from .stacked import predict_stacked
+from .utils import (
+    WINTER_MONTHS, load_model, load_csv_data, get_data_version, calculate_seasonal_average,
+)
+
+# 予測マトリクスの統計量（3次元目の並び）
+STATISTICS = ['yhat', 'yhat_lower', 'yhat_upper', 'average', 'deviation']
+
+MATRIX_CACHE_KEY = 'forecast_matrix:{version}'
+MATRIX_CACHE_TIMEOUT = 60 * 60 * 24
+
+_matrix_lock = threading.Lock()
+_local_matrix = None
+
+
+def build_forecast_matrix(resorts, version):
+    """スキー場 × 月 × 統計量 の予測マトリクスを作成
+
+    構造が同じモデルは全スキー場分を一括で予測し、対応しないモデルのみ個別に予測する。
+    """
+    values = np.full((len(resorts), len(WINTER_MONTHS), len(STATISTICS)), np.nan)
+    resort_ids = [resort.pk for resort in resorts]
+    resort_names = [resort.name for resort in resorts]
+
+    items = []
+    for i, resort in enumerate(resorts):
+        model = load_model(resort.model_file)
+        historical_df = load_csv_data(resort.csv_file)
+        if model is not None and historical_df is not None:
+            items.append((i, resort, model, historical_df))
+
+    forecasts = predict_stacked([(model, historical_df) for _, _, model, historical_df in items])
+
+    for (i, resort, _, historical_df), forecast in zip(items, forecasts):
+        if forecast is None:
+            try:
+                # マトリクスは最新バージョンの予測のみで構成する
+                future_forecast = get_forecast(resort, allow_stale=False)['future_forecast']
+            except ForecastDataNotFound:
+                continue
+        else:
+            future_forecast = forecast[forecast['ds'] > historical_df['ds'].max()]
+
+        monthly = future_forecast.groupby(future_forecast['ds'].dt.month)[
+            ['yhat', 'yhat_lower', 'yhat_upper']
+        ].first().reindex(WINTER_MONTHS)
+
+        values[i, :, 0:3] = monthly.clip(lower=0).to_numpy()
+        values[i, :, 3] = calculate_seasonal_average(historical_df).to_numpy()
+
+    values[:, :, 4] = values[:, :, 0] - values[:, :, 3]
+
+    return {
+        'version': version,
+        'resort_ids': resort_ids,
+        'resort_names': resort_names,
+        'months': list(WINTER_MONTHS),
+        'statistics': list(STATISTICS),
+        'values': values,
+    }
+
+
+def get_forecast_matrix():
+    """最新の予測マトリクスを取得（モデル・データ更新時は再計算）"""
+    global _local_matrix
+
+    resorts = list(SkiResort.objects.order_by('pk'))
+    version = get_data_version(resorts)
+
+    matrix = _local_matrix
+    if matrix is not None and matrix['version'] == version:
+        return matrix
+
+    with _matrix_lock:
+        matrix = _local_matrix
+        if matrix is not None and matrix['version'] == version:
+            return matrix
+
+        cache_key = MATRIX_CACHE_KEY.format(version=version)
+        matrix = cache.get(cache_key)
+        if matrix is None:
+            matrix = build_forecast_matrix(resorts, version)
+            cache.set(cache_key, matrix, MATRIX_CACHE_TIMEOUT)
+
+        _local_matrix = matrix
+        return matrix
+
+
+def _to_json_value(value):
+    """NaN を None に変換して丸める"""
+    return None if np.isnan(value) else round(float(value), 1)
+
+
+def rank_resorts(matrix, months, statistic='yhat', top=None):
+    """指定月の平均値でスキー場を降順に並べ替える"""
+    month_index = [matrix['months'].index(month) for month in months]
+    stat_index = matrix['statistics'].index(statistic)
+
+    selected = matrix['values'][:, month_index, :]
+    scores = selected[:, :, stat_index].mean(axis=1)
+
+    # 欠損（モデル未配置など）は最下位に回す
+    order = np.argsort(np.where(np.isnan(scores), -np.inf, -scores), kind='stable')
+    if top:
+        order = order[:top]
+
+    ranking = []
+    for rank, i in enumerate(order, start=1):
+        if np.isnan(scores[i]):
+            continue
+        ranking.append({
+            'rank': rank,
+            'resort_id': matrix['resort_ids'][i],
+            'resort_name': matrix['resort_names'][i],
+            'score': _to_json_value(scores[i]),
+            'months': [
+                {
+                    'month': month,
+                    **{
+                        stat: _to_json_value(selected[i, j, k])
+                        for k, stat in enumerate(matrix['statistics'])
+                    },
+                }
+                for j, month in enumerate(months)
+            ],
+        })
+    return ranking
@@ -0,0 +1,94 @@
+import copy
+import os
+import pickle
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from prophet.diagnostics import prophet_copy
+from prophet.utilities import warm_start_params
+
+from .utils import create_future_dataframe, get_training_data
+
+
+def get_model_history(model):
+    """学習済みモデルの学習データ（標準化されたリグレッサーを元の値に戻す）"""
+    names = list(model.extra_regressors.keys())
+    history = model.history[['ds', 'y'] + names].copy()
+    for name, props in model.extra_regressors.items():
+        history[name] = history[name] * props['std'] + props['mu']
+    return history
+
+
+def get_new_rows(model, historical_df):
+    """モデルの学習後にCSVに追加された学習データの行"""
+    training_df = get_training_data(model, historical_df)
+    return training_df[training_df['ds'] > model.history['ds'].max()].reset_index(drop=True)
+
+
+def build_training_data(model, historical_df):
+    """再学習用の学習データ（モデルの学習データ + 新しく追加された行）"""
+    return pd.concat(
+        [get_model_history(model), get_new_rows(model, historical_df)], ignore_index=True
+    )
+
+
+def fit_model(template_model, training_df, warm_start=True):
+    """テンプレートと同じ設定でモデルを再学習
+
+    warm_start の場合は現在のモデルの学習済みパラメータを Stan の初期値とする。
+    """
+    model = prophet_copy(template_model)
+    kwargs = {'init': warm_start_params(template_model)} if warm_start else {}
+
+    started = time.monotonic()
+    model.fit(training_df, **kwargs)
+    return model, time.monotonic() - started
+
+
+def max_forecast_difference(model_a, model_b, historical_df):
+    """2つのモデルの予測値（yhat）の最大差 (cm)"""
+    forecasts = []
+    for model in (model_a, model_b):
+        future_df = create_future_dataframe(model, historical_df)
+        # 点予測のみ比較するため、区間のサンプリングを省いたコピーで予測する
+        point_model = copy.copy(model)
+        point_model.uncertainty_samples = 0
+        forecasts.append(point_model.predict(future_df)['yhat'].to_numpy())
+    return float(np.abs(forecasts[0] - forecasts[1]).max())
+
+
+def get_log_posterior(model):
+    """MAP 推定で最大化した Stan の目的関数（対数事後確率）。取得できない場合は None"""
+    stan_fit = getattr(model, 'stan_fit', None)
+    params = getattr(stan_fit, 'optimized_params_dict', None)
+    if not params or 'lp__' not in params:
+        return None
+    return float(params['lp__'])
+
+
+def save_model_atomic(model, model_path):
+    """モデルを一時ファイルに書き出してから置き換える（読み込み中のワーカーに不完全なファイルを見せない）"""
+    full_path = os.path.join(settings.BASE_DIR, model_path)
+    directory = os.path.dirname(full_path)
+
+    # mkstemp は 0600 で作成するため、別ユーザーの gunicorn ワーカーが読めるよう元のファイルの権限を引き継ぐ
+    try:
+        mode = os.stat(full_path).st_mode & 0o777
+    except OSError:
+        mode = 0o644
+
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_', suffix='.pkl')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(model, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, full_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
@@ -0,0 +1,68 @@
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Prediction, PredictionDailyAggregate
+
+
+def aggregate_rows(rows):
+    """予測結果ログの行を (スキー場, 日付) ごとに集計"""
+    aggregates = {}
+    for resort_id, created_at, selected_months in rows:
+        key = (resort_id, timezone.localdate(created_at))
+        aggregate = aggregates.setdefault(key, {
+            'count': 0,
+            'month_counts': Counter(),
+            'first_at': created_at,
+            'last_at': created_at,
+        })
+        aggregate['count'] += 1
+        aggregate['month_counts'].update(str(month) for month in selected_months or [])
+        aggregate['first_at'] = min(aggregate['first_at'], created_at)
+        aggregate['last_at'] = max(aggregate['last_at'], created_at)
+    return aggregates
+
+
+def merge_aggregates(aggregates):
+    """既存の日別集計に加算（同じ日のログが複数のバッチに分かれても1行にまとめる）"""
+    for (resort_id, date), values in aggregates.items():
+        aggregate = PredictionDailyAggregate.objects.select_for_update().filter(
+            resort_id=resort_id, date=date
+        ).first()
+        if aggregate is None:
+            PredictionDailyAggregate.objects.create(
+                resort_id=resort_id,
+                date=date,
+                count=values['count'],
+                month_counts=dict(values['month_counts']),
+                first_at=values['first_at'],
+                last_at=values['last_at'],
+            )
+            continue
+
+        aggregate.count += values['count']
+        aggregate.month_counts = dict(Counter(aggregate.month_counts) + values['month_counts'])
+        aggregate.first_at = min(aggregate.first_at, values['first_at'])
+        aggregate.last_at = max(aggregate.last_at, values['last_at'])
+        aggregate.save(update_fields=['count', 'month_counts', 'first_at', 'last_at', 'updated_at'])
+
+
+def compact_batch(cutoff, batch_size):
+    """cutoff より古いログを1バッチ分集計して削除（集計と削除は同じトランザクションで行う）
+
+    戻り値は処理した行数（0 の場合は対象のログが残っていない）。
+    """
+    with transaction.atomic():
+        # 予測データ本体（prediction_data）は集計に使わないため読み込まない
+        rows = list(
+            Prediction.objects.filter(created_at__lt=cutoff)
+            .order_by('created_at', 'pk')
+            .values_list('pk', 'resort_id', 'created_at', 'selected_months')[:batch_size]
+        )
+        if not rows:
+            return 0
+
+        merge_aggregates(aggregate_rows(row[1:] for row in rows))
+        Prediction.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    return len(rows)
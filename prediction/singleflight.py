@@ -0,0 +1,113 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+
+class _Call:
+    """実行中の計算（同一キーの待機者が結果を共有する）"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self, timeout):
+        if not self.event.wait(timeout):
+            raise TimeoutError('先行リクエストの計算完了を待機中にタイムアウトしました。')
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class SingleFlight:
+    """同一キーの計算を1回にまとめる（stale-while-revalidate 対応）
+
+    - プロセス内: キーごとに実行中の計算は1つだけとし、他のスレッドはその結果を待つ
+    - プロセス間: キャッシュの短期ロックで計算するワーカーを1つに絞る
+    - 古い結果がある場合、待機者には再計算を待たずに古い結果を返す
+    """
+
+    def __init__(self, fresh_timeout, stale_timeout, lock_timeout, wait_timeout):
+        self.fresh_timeout = fresh_timeout
+        self.stale_timeout = stale_timeout
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def get_stale(self, key):
+        """鮮度を問わずキャッシュ済みの結果を返す"""
+        entry = cache.get(key)
+        return entry['value'] if entry is not None else None
+
+    def do(self, key, version, compute, allow_stale=True):
+        """キャッシュ済みの結果を返し、なければ計算する"""
+        entry = cache.get(key)
+        if self._is_fresh(entry, version):
+            return entry['value']
+        stale = entry['value'] if entry is not None and allow_stale else None
+
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _Call()
+
+        if not is_leader:
+            if stale is not None:
+                return stale
+            return call.wait(self.wait_timeout)
+
+        try:
+            value = self._compute_once(key, version, compute, stale)
+            call.value = value
+            return value
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            call.event.set()
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _is_fresh(self, entry, version):
+        return (
+            entry is not None
+            and entry['version'] == version
+            and entry['expires_at'] > time.time()
+        )
+
+    def _compute_once(self, key, version, compute, stale):
+        """プロセス間ロックを取得したワーカーのみ計算する"""
+        lock_key = f'{key}:lock'
+        deadline = time.monotonic() + self.wait_timeout
+
+        while True:
+            if cache.add(lock_key, True, self.lock_timeout):
+                try:
+                    return self._compute_and_store(key, version, compute)
+                finally:
+                    cache.delete(lock_key)
+
+            # 他のワーカーが計算中
+            if stale is not None:
+                return stale
+
+            entry = cache.get(key)
+            if self._is_fresh(entry, version):
+                return entry['value']
+
+            if time.monotonic() >= deadline:
+                # ロック保持者が応答しない場合は自分で計算する
+                return self._compute_and_store(key, version, compute)
+            time.sleep(0.05)
+
+    def _compute_and_store(self, key, version, compute):
+        value = compute()
+        cache.set(key, {
+            'version': version,
+            'value': value,
+            'expires_at': time.time() + self.fresh_timeout,
+        }, self.fresh_timeout + self.stale_timeout)
+        return value
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+from .utils import FORECAST_PERIODS, FORECAST_FREQ, PREDICTION_RANDOM_SEED
+
+NANOSECONDS_PER_DAY = 24 * 60 * 60 * 1e9
+
+
+def get_structure_key(model):
+    """一括予測で同じ配列にまとめられるモデル構造のキー（対応しないモデルは None）
+
+    線形トレンド・MAP 推定で、休日・条件付き季節性・リグレッサーの予測モデルを使わないものが対象。
+    """
+    if (
+        model.history is None
+        or model.growth != 'linear'
+        or model.logistic_floor
+        or model.holidays is not None
+        or model.country_holidays is not None
+        or model.params['k'].shape[0] != 1
+        or any(props['condition_name'] is not None for props in model.seasonalities.values())
+        or any(props.get('predictor') is not None for props in model.extra_regressors.values())
+    ):
+        return None
+
+    return (
+        model.scaling,
+        model.uncertainty_samples,
+        model.interval_width,
+        tuple(
+            (name, props['period'], props['fourier_order'], props['mode'])
+            for name, props in model.seasonalities.items()
+        ),
+        tuple((name, props['mode']) for name, props in model.extra_regressors.items()),
+    )
+
+
+def get_future_dates(model):
+    """モデルの学習データの翌月からの予測日（make_future_dataframe の未来部分と同じ）"""
+    last_date = model.history_dates.max()
+    dates = pd.date_range(start=last_date, periods=FORECAST_PERIODS + 1, freq=FORECAST_FREQ)
+    return dates[dates > last_date][:FORECAST_PERIODS]
+
+
+def get_future_regressors(model, historical_df, future_dates):
+    """未来のリグレッサー（過去の月別平均、create_future_dataframe と同じ値）"""
+    names = list(model.extra_regressors.keys())
+    monthly = historical_df.groupby(historical_df['ds'].dt.month)[names].mean()
+    return monthly.reindex(future_dates.month).to_numpy(dtype=float)
+
+
+class StackedProphet:
+    """構造が同じ Prophet モデルの学習済みパラメータを配列に積み重ね、全モデルの未来予測を一括で計算する
+
+    トレンド・季節性・リグレッサーの各項は (モデル, 予測日) の配列として1回のブロードキャストで評価する。
+    予測区間は model.predict と同じ乱数列を1回だけ生成し、モデルごとのスケールを掛けて再現する。
+    """
+
+    def __init__(self, models):
+        self.models = models
+        first = models[0]
+        n_changepoints = max(len(model.changepoints_t) for model in models)
+
+        def stack(values):
+            return np.array(values, dtype=float)
+
+        def pad(values):
+            # 変化点数の違いは、変化量0の変化点 (t=0) で埋める
+            return stack([np.pad(value, (0, n_changepoints - len(value))) for value in values])
+
+        self.k = stack([np.nanmean(model.params['k']) for model in models])
+        self.m = stack([np.nanmean(model.params['m']) for model in models])
+        self.delta = pad([np.nanmean(model.params['delta'], axis=0) for model in models])
+        self.changepoints_t = pad([np.asarray(model.changepoints_t, dtype=float) for model in models])
+        self.n_changepoints = stack([len(model.changepoints_t) for model in models])
+        self.beta = stack([np.nanmean(model.params['beta'], axis=0) for model in models])
+        self.sigma = stack([model.params['sigma_obs'][0] for model in models]).reshape(-1)
+
+        self.y_scale = stack([model.y_scale for model in models])
+        self.floor = stack([model.y_min if model.scaling == 'minmax' else 0. for model in models])
+        self.start = np.array([model.start.value for model in models], dtype=np.int64)
+        self.t_scale = np.array([model.t_scale.value for model in models], dtype=np.int64)
+        self.n_history = np.array([len(model.history_dates) for model in models])
+
+        self.regressor_mu = stack([
+            [props['mu'] for props in model.extra_regressors.values()] for model in models
+        ]).reshape(len(models), -1)
+        self.regressor_std = stack([
+            [props['std'] for props in model.extra_regressors.values()] for model in models
+        ]).reshape(len(models), -1)
+
+        # 特徴量の並び（季節性 → リグレッサー）と加法・乗法の区分はモデル間で共通
+        self.seasonalities = [
+            (props['period'], props['fourier_order']) for props in first.seasonalities.values()
+        ]
+        self.additive = first.train_component_cols['additive_terms'].to_numpy(dtype=float)
+        self.multiplicative = first.train_component_cols['multiplicative_terms'].to_numpy(dtype=float)
+        self.uncertainty_samples = first.uncertainty_samples
+        self.interval_width = first.interval_width
+
+    def make_features(self, dates, regressors):
+        """季節性（フーリエ級数）と標準化したリグレッサーの特徴量 (モデル, 予測日, 特徴量)"""
+        days = (dates - np.datetime64('1970-01-01', 'ns')).astype(np.int64) / NANOSECONDS_PER_DAY
+        x_t = np.pi * 2 * days
+
+        features = []
+        for period, order in self.seasonalities:
+            for i in range(order):
+                c = (i + 1) / period * x_t
+                features.append(np.sin(c))
+                features.append(np.cos(c))
+        standardized = (regressors - self.regressor_mu[:, None, :]) / self.regressor_std[:, None, :]
+        return np.concatenate([np.stack(features, axis=-1), standardized], axis=-1)
+
+    def predict(self, dates, regressors):
+        """未来予測 (モデル, 予測日) の yhat・予測区間
+
+        dates: (モデル, 予測日) の datetime64[ns]、各モデルの学習データより後の日付
+        regressors: (モデル, 予測日, リグレッサー) の値
+        """
+        t = (dates.astype(np.int64) - self.start[:, None]) / self.t_scale[:, None]
+
+        # 区分線形トレンド
+        deltas_t = (self.changepoints_t[:, None, :] <= t[..., None]) * self.delta[:, None, :]
+        k_t = deltas_t.sum(axis=-1) + self.k[:, None]
+        m_t = (deltas_t * -self.changepoints_t[:, None, :]).sum(axis=-1) + self.m[:, None]
+        trend_scaled = k_t * t + m_t
+        trend = trend_scaled * self.y_scale[:, None] + self.floor[:, None]
+
+        features = self.make_features(dates, regressors)
+        additive = np.einsum('rdp,rp->rd', features, self.beta * self.additive) * self.y_scale[:, None]
+        multiplicative = np.einsum('rdp,rp->rd', features, self.beta * self.multiplicative)
+
+        result = {'yhat': trend * (1 + multiplicative) + additive}
+        if self.uncertainty_samples:
+            result.update(self.predict_intervals(t, trend_scaled, additive, multiplicative))
+        return result
+
+    def predict_intervals(self, t, trend_scaled, additive, multiplicative):
+        """トレンドの変化と観測ノイズをサンプリングして予測区間を計算
+
+        Prophet のベクトル化版サンプリングと同じ順序で乱数を生成するため、
+        同じシードの model.predict と同じ区間になる。
+        """
+        n_models, n_dates = t.shape
+        n_samples = self.uncertainty_samples
+        rng = np.random.RandomState(PREDICTION_RANDOM_SEED)
+
+        # ラプラス分布・正規分布の乱数は尺度に比例するため、標準化した乱数を全モデルで共有する
+        uniform = rng.uniform(size=(n_samples, n_dates))
+        laplace = rng.laplace(0, 1, size=(n_samples, n_dates))
+        n_rows = self.n_history + n_dates
+        normal = rng.normal(0, 1, size=n_samples * n_rows.max())
+
+        single_diff = np.diff(t, axis=1).mean(axis=1)
+        likelihood = self.n_changepoints * single_diff
+        mean_delta = np.abs(self.delta).sum(axis=1) / np.maximum(self.n_changepoints, 1) + 1e-8
+
+        shifts = laplace[None] * mean_delta[:, None, None] * (uniform[None] < likelihood[:, None, None])
+        shifted = np.concatenate([np.zeros((n_models, n_samples, 1)), shifts[:, :, :-1]], axis=2)
+        uncertainty = ((shifted + shifts) / 2).cumsum(axis=2).cumsum(axis=2) * single_diff[:, None, None]
+        trends = (trend_scaled[:, None, :] + uncertainty) * self.y_scale[:, None, None] + self.floor[:, None, None]
+
+        # model.predict では学習期間を含む (サンプル数, 全予測日) の順に正規乱数を割り当てる
+        index = (
+            np.arange(n_samples)[None, :, None] * n_rows[:, None, None]
+            + self.n_history[:, None, None]
+            + np.arange(n_dates)[None, None, :]
+        )
+        noise = normal[index] * self.sigma[:, None, None] * self.y_scale[:, None, None]
+
+        samples = trends * (1 + multiplicative[:, None, :]) + additive[:, None, :] + noise
+        return {
+            'yhat_lower': np.percentile(samples, 100 * (1.0 - self.interval_width) / 2, axis=1),
+            'yhat_upper': np.percentile(samples, 100 * (1.0 + self.interval_width) / 2, axis=1),
+        }
+
+
+def predict_stacked(items):
+    """複数モデルの未来予測を構造ごとにまとめて一括計算
+
+    items: (model, historical_df) のリスト
+    戻り値: items と同じ順の DataFrame (ds, yhat, yhat_lower, yhat_upper)。
+    一括計算に対応しないモデルは None（呼び出し側で model.predict を使う）。
+    """
+    results = [None] * len(items)
+    groups = {}
+    for i, (model, historical_df) in enumerate(items):
+        key = get_structure_key(model)
+        if key is None:
+            continue
+        dates = get_future_dates(model)
+        regressors = get_future_regressors(model, historical_df, dates)
+        if len(dates) != FORECAST_PERIODS or np.isnan(regressors).any():
+            continue
+        groups.setdefault(key, []).append((i, model, dates, regressors))
+
+    for members in groups.values():
+        stacked = StackedProphet([model for _, model, _, _ in members])
+        dates = np.stack([dates.to_numpy(dtype='datetime64[ns]') for _, _, dates, _ in members])
+        regressors = np.stack([regressors for _, _, _, regressors in members])
+        forecast = stacked.predict(dates, regressors)
+
+        for row, (i, _, future_dates, _) in enumerate(members):
+            results[i] = pd.DataFrame({
+                'ds': future_dates,
+                **{column: values[row] for column, values in forecast.items()},
+            })
+    return results
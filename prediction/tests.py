@@ -0,0 +1,434 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from . import forecasting
+from .admission import AdmissionLimiter, AdmissionRejected
+from .forecasting import get_forecast
+from .forms import WhatIfForm
+from .memory import MemorySampler, tracemalloc_profiler
+from .middleware import MemoryGrowthMiddleware
+from .models import SkiResort
+from .utils import (
+    ALL_MONTHS, load_model, load_csv_data, create_prediction_data, create_comparison_data,
+    get_file_signature, get_training_data, create_future_dataframe, predict_forecast,
+)
+from .refit import get_model_history, save_model_atomic
+from .stacked import predict_stacked
+
+
+def frame_digest(df):
+    """DataFrame の内容から比較用のハッシュ値を計算"""
+    return int(pd.util.hash_pandas_object(df, index=True).sum())
+
+
+def run_pipeline(model, historical_df, selected_months):
+    """予測パイプラインを1回実行し、結果を比較可能な形で返す"""
+    future_forecast, full_forecast, _ = create_prediction_data(
+        model, historical_df, ALL_MONTHS
+    )
+    chart_data = create_comparison_data(full_forecast, historical_df, selected_months)
+    return (
+        frame_digest(future_forecast),
+        frame_digest(full_forecast),
+        json.dumps(chart_data, sort_keys=True),
+    )
+
+
+class PredictionConcurrencyTests(TestCase):
+    """予測パイプラインを多数のスレッドから同時実行し、結果が決定的で共有データが変更されないことを確認
+
+    model.predict は乱数シードを固定するためプロセス内で直列化されるが、
+    未来データフレームの作成・比較データの作成・共有オブジェクトの読み込みは並行に実行される。
+    """
+
+    THREADS = 8
+    ITERATIONS = 24
+
+    @classmethod
+    def setUpTestData(cls):
+        # 草津は積雪量の欠測を含む
+        cls.resorts = [
+            SkiResort.objects.create(
+                name='野沢温泉', model_file='data/nozawa_model.pkl', csv_file='data/nozawa_data.csv'
+            ),
+            SkiResort.objects.create(
+                name='草津', model_file='data/kusatsu_model.pkl', csv_file='data/Kusatsu_data.csv'
+            ),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_pipeline_is_deterministic(self):
+        month_sets = [ALL_MONTHS[:i + 1] for i in range(len(ALL_MONTHS))]
+
+        for resort in self.resorts:
+            with self.subTest(resort=resort.name):
+                # スレッド間で共有される読み取り専用オブジェクト
+                model = load_model(resort.model_file)
+                historical_df = load_csv_data(resort.csv_file)
+                expected = {
+                    tuple(months): run_pipeline(model, historical_df, months)
+                    for months in month_sets
+                }
+
+                with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+                    futures = [
+                        (months, executor.submit(run_pipeline, model, historical_df, months))
+                        for i in range(self.ITERATIONS)
+                        for months in [month_sets[i % len(month_sets)]]
+                    ]
+                    for months, future in futures:
+                        self.assertEqual(future.result(), expected[tuple(months)])
+
+    def test_pipeline_does_not_mutate_shared_data(self):
+        for resort in self.resorts:
+            with self.subTest(resort=resort.name):
+                model = load_model(resort.model_file)
+                historical_df = load_csv_data(resort.csv_file)
+                columns = list(historical_df.columns)
+                data_digest = frame_digest(historical_df)
+                history_digest = frame_digest(model.history)
+
+                with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+                    for future in [
+                        executor.submit(run_pipeline, model, historical_df, ALL_MONTHS)
+                        for _ in range(self.THREADS)
+                    ]:
+                        future.result()
+
+                self.assertEqual(list(historical_df.columns), columns)
+                self.assertEqual(frame_digest(historical_df), data_digest)
+                self.assertEqual(frame_digest(model.history), history_digest)
+
+    def test_concurrent_get_forecast_computes_once(self):
+        resort = self.resorts[0]
+
+        with mock.patch.object(
+            forecasting, 'compute_forecast', wraps=forecasting.compute_forecast
+        ) as compute:
+            with ThreadPoolExecutor(max_workers=self.THREADS) as executor:
+                results = list(executor.map(lambda _: get_forecast(resort), range(self.THREADS)))
+
+        self.assertEqual(compute.call_count, 1)
+        digests = {frame_digest(result['future_forecast']) for result in results}
+        self.assertEqual(len(digests), 1)
+
+
+class WhatIfFormTests(TestCase):
+    """What-if の上書き値の検証"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.resort = SkiResort.objects.create(
+            name='野沢温泉', model_file='data/nozawa_model.pkl', csv_file='data/nozawa_data.csv'
+        )
+
+    def make_form(self, value, mode='delta'):
+        return WhatIfForm({
+            'resort': self.resort.pk,
+            'overrides': json.dumps({'1': {'日最高気温の平均(℃)': value}}),
+            'mode': mode,
+        })
+
+    def test_accepts_finite_values(self):
+        form = self.make_form('-2.5')
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['overrides'], {1: {'日最高気温の平均(℃)': -2.5}})
+
+    def test_rejects_non_finite_and_huge_values(self):
+        for value in ['nan', 'inf', '-Infinity', 1e308]:
+            with self.subTest(value=value):
+                form = self.make_form(value, mode='value')
+                self.assertFalse(form.is_valid())
+                self.assertIn('overrides', form.errors)
+
+
+class MetricsAccessTests(TestCase):
+    """ワーカーの計測値は staff ユーザーのみ取得できる"""
+
+    def test_anonymous_is_redirected_to_login(self):
+        for path in ['/metrics/', '/metrics/memory/']:
+            with self.subTest(path=path):
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 302)
+                self.assertIn('/admin/login/', response['Location'])
+
+    def test_staff_can_read_metrics(self):
+        self.client.force_login(User.objects.create_user('staff', is_staff=True))
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('memory', response.json())
+
+
+class DataVersionTests(TestCase):
+    """データバージョンはファイル内容で決まり、インスタンス間で一致する"""
+
+    def setUp(self):
+        self.base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.base_dir)
+        self.path = 'data.csv'
+        self.full_path = os.path.join(self.base_dir, self.path)
+        with open(self.full_path, 'w') as f:
+            f.write('a,b\n1,2\n')
+
+    def test_signature_ignores_mtime(self):
+        with override_settings(BASE_DIR=self.base_dir):
+            before = get_file_signature(self.path)
+            # 別のインスタンスへのデプロイで更新時刻だけが異なる場合
+            os.utime(self.full_path, ns=(0, 10 ** 18))
+            self.assertEqual(get_file_signature(self.path), before)
+
+    def test_signature_changes_with_content(self):
+        with override_settings(BASE_DIR=self.base_dir):
+            before = get_file_signature(self.path)
+            with open(self.full_path, 'w') as f:
+                f.write('a,b\n1,30\n')
+            self.assertNotEqual(get_file_signature(self.path), before)
+
+
+class ForecastWaitTimeoutTests(TestCase):
+    """先行リクエストの計算待ちのタイムアウトは混雑として 503 を返す"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.resort = SkiResort.objects.create(
+            name='野沢温泉', model_file='data/nozawa_model.pkl', csv_file='data/nozawa_data.csv'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_wait_timeout_returns_503_with_retry_after(self):
+        with mock.patch.object(forecasting.forecast_flight, 'do', side_effect=TimeoutError):
+            response = self.client.get('/predict/', {'resort': self.resort.pk})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(forecasting.predict_limiter.retry_after))
+
+
+class AdmissionLimiterTests(SimpleTestCase):
+    """予測計算の同時実行数・待機キューの制限"""
+
+    def make_limiter(self, max_queue=1, queue_timeout=5):
+        return AdmissionLimiter(
+            max_concurrency=1, max_queue=max_queue, queue_timeout=queue_timeout, retry_after=7
+        )
+
+    def hold_slot(self, limiter):
+        """実行枠を1つ確保し、解放する関数を返す"""
+        admission = limiter.admit()
+        admission.__enter__()
+        return lambda: admission.__exit__(None, None, None)
+
+    def test_rejects_immediately_when_queue_is_full(self):
+        limiter = self.make_limiter(max_queue=0)
+        release = self.hold_slot(limiter)
+        self.addCleanup(release)
+
+        with self.assertRaises(AdmissionRejected) as cm:
+            with limiter.admit():
+                pass
+
+        self.assertEqual(cm.exception.reason, 'queue_full')
+        self.assertEqual(cm.exception.retry_after, 7)
+        stats = limiter.stats()
+        self.assertEqual(stats['rejected_queue_full'], 1)
+        self.assertEqual(stats['in_flight'], 1)
+
+    def test_rejects_after_queue_timeout(self):
+        limiter = self.make_limiter(queue_timeout=0.05)
+        release = self.hold_slot(limiter)
+        self.addCleanup(release)
+
+        with self.assertRaises(AdmissionRejected) as cm:
+            with limiter.admit():
+                pass
+
+        self.assertEqual(cm.exception.reason, 'timeout')
+        stats = limiter.stats()
+        self.assertEqual(stats['rejected_timeout'], 1)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    def test_waiting_request_is_admitted_when_slot_is_released(self):
+        limiter = self.make_limiter()
+        release = self.hold_slot(limiter)
+        admitted = threading.Event()
+
+        def waiter():
+            with limiter.admit():
+                admitted.set()
+
+        thread = threading.Thread(target=waiter)
+        thread.start()
+        while limiter.stats()['queue_depth'] == 0:
+            time.sleep(0.01)
+        self.assertFalse(admitted.is_set())
+
+        release()
+        thread.join(5)
+        self.assertTrue(admitted.is_set())
+        stats = limiter.stats()
+        self.assertEqual((stats['admitted'], stats['in_flight'], stats['queue_depth']), (2, 0, 0))
+
+    def test_reject_and_stale_are_counted(self):
+        limiter = self.make_limiter()
+
+        error = limiter.reject('flight_timeout')
+        limiter.record_stale()
+
+        self.assertIsInstance(error, AdmissionRejected)
+        self.assertEqual(error.retry_after, 7)
+        stats = limiter.stats()
+        self.assertEqual((stats['rejected_flight_timeout'], stats['served_stale']), (1, 1))
+
+
+class ExportAdmissionTests(TestCase):
+    """混雑時のエクスポート（送信開始前は 503、送信開始後は途中で打ち切らない）"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.resorts = [
+            SkiResort.objects.create(
+                name='野沢温泉', model_file='data/nozawa_model.pkl', csv_file='data/nozawa_data.csv'
+            ),
+            SkiResort.objects.create(
+                name='草津', model_file='data/kusatsu_model.pkl', csv_file='data/Kusatsu_data.csv'
+            ),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rejected_before_streaming_returns_503(self):
+        error = AdmissionRejected('queue_full', 7)
+        with mock.patch.object(forecasting.predict_limiter, 'admit', side_effect=error):
+            response = self.client.get('/export/', {'format': 'ndjson'})
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+
+    def test_rejected_while_streaming_still_exports_every_resort(self):
+        error = AdmissionRejected('queue_full', 7)
+        with mock.patch('prediction.export.get_forecast_or_stale', side_effect=error):
+            response = self.client.get('/export/', {'format': 'ndjson'})
+            rows = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {row['resort'] for row in rows if row['kind'] == 'forecast'}, {'野沢温泉', '草津'}
+        )
+
+
+class TrainingDataTests(SimpleTestCase):
+    """バックテスト・再学習の学習データは配信中のモデルの学習データと一致する"""
+
+    def test_matches_served_model_history(self):
+        # 草津・猪苗代・湯沢は積雪量の欠測を含む
+        for model_file, csv_file in [
+            ('data/kusatsu_model.pkl', 'data/Kusatsu_data.csv'),
+            ('data/inawashiro_model.pkl', 'data/Inawashiro_data.csv'),
+            ('data/yuzawa_model.pkl', 'data/Yuzawa_data.csv'),
+        ]:
+            with self.subTest(model_file=model_file):
+                model = load_model(model_file)
+                training_df = get_training_data(model, load_csv_data(csv_file))
+                training_df = training_df[training_df['ds'] <= model.history['ds'].max()]
+                history = get_model_history(model)
+
+                self.assertEqual(list(training_df.columns), list(history.columns))
+                self.assertEqual(
+                    training_df['ds'].dt.strftime('%Y-%m').tolist(), history['ds'].dt.strftime('%Y-%m').tolist()
+                )
+                np.testing.assert_allclose(
+                    training_df.drop(columns='ds').to_numpy(dtype=float),
+                    history.drop(columns='ds').to_numpy(dtype=float),
+                    rtol=0, atol=1e-9
+                )
+
+
+class StackedForecastTests(SimpleTestCase):
+    """一括予測は model.predict と同じ値になる（Prophet の乱数の引き順に依存するため更新時に検知する）"""
+
+    RESORT_FILES = [
+        ('data/hakuba_model.pkl', 'data/Hakuba_data.csv'),
+        ('data/inawashiro_model.pkl', 'data/Inawashiro_data.csv'),
+        ('data/karuizawa_model.pkl', 'data/Karuizawa_data.csv'),
+        ('data/kusatsu_model.pkl', 'data/Kusatsu_data.csv'),
+        ('data/nozawa_model.pkl', 'data/nozawa_data.csv'),
+        ('data/sugadaira_model.pkl', 'data/Sugadaira_data.csv'),
+        ('data/yuzawa_model.pkl', 'data/Yuzawa_data.csv'),
+    ]
+
+    def test_matches_model_predict(self):
+        items = [(load_model(model_file), load_csv_data(csv_file)) for model_file, csv_file in self.RESORT_FILES]
+        forecasts = predict_stacked(items)
+
+        # 配信中のモデルはすべて一括予測の対象になる
+        self.assertTrue(all(forecast is not None for forecast in forecasts))
+        for (model_file, _), (model, historical_df), forecast in zip(self.RESORT_FILES, items, forecasts):
+            with self.subTest(model_file=model_file):
+                expected = predict_forecast(model, create_future_dataframe(model, historical_df))
+                expected = expected.set_index('ds').reindex(forecast['ds'])
+                for column in ['yhat', 'yhat_lower', 'yhat_upper']:
+                    np.testing.assert_allclose(
+                        forecast[column].to_numpy(), expected[column].to_numpy(), rtol=0, atol=1e-6
+                    )
+
+
+class SaveModelTests(SimpleTestCase):
+    """モデルファイルの置き換え"""
+
+    def test_replacement_keeps_file_mode(self):
+        base_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, base_dir)
+        full_path = os.path.join(base_dir, 'model.pkl')
+        with open(full_path, 'wb') as f:
+            f.write(b'old')
+        os.chmod(full_path, 0o644)
+
+        with override_settings(BASE_DIR=base_dir):
+            save_model_atomic({'params': 1}, 'model.pkl')
+
+        self.assertEqual(os.stat(full_path).st_mode & 0o777, 0o644)
+        self.assertEqual(os.listdir(base_dir), ['model.pkl'])
+
+
+class WorkerInstrumentationTests(SimpleTestCase):
+    """ワーカーごとの計測（どのワーカーが応答しても取得できること）"""
+
+    def test_tracing_starts_in_each_worker_when_enabled(self):
+        self.addCleanup(tracemalloc_profiler.stop)
+        sampler = MemorySampler(interval=3600, history=1)
+        request = mock.Mock(path='/health/')
+
+        with override_settings(SNOW_DEEP_TRACEMALLOC_ON_START=True):
+            middleware = MemoryGrowthMiddleware(lambda request: None)
+        # 新しいワーカープロセスの最初のリクエスト
+        with mock.patch('prediction.middleware.memory_sampler', sampler):
+            middleware(request)
+
+        self.assertTrue(tracemalloc_profiler.is_tracing())
+
+    def test_worker_stats_are_logged(self):
+        sampler = MemorySampler(interval=3600, history=1, log_stats=True)
+
+        with self.assertLogs('prediction.memory', level='INFO') as logs:
+            sampler.log_worker_stats(sampler.sample())
+
+        stats = json.loads(logs.records[0].getMessage().split(' ', 1)[1])
+        self.assertEqual(stats['pid'], os.getpid())
+        self.assertIn('queue_depth', stats['admission'])
+        self.assertIn('rejected_queue_full', stats['admission'])
@@ -6,5 +6,11 @@ app_name = 'prediction'
 urlpatterns = [
     path('', views.index, name='index'),
     path('predict/', views.predict, name='predict'),
+    path('whatif/', views.whatif, name='whatif'),
+    path('climatology/', views.climatology, name='climatology'),
+    path('ranking/', views.ranking, name='ranking'),
+    path('export/', views.export, name='export'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('metrics/memory/', views.memory_profile, name='memory_profile'),
     path('health/', views.health_check, name='health'),
 ]
@@ -1,26 +1,84 @@
+import hashlib
 import pickle
+import threading
+import numpy as np
 import pandas as pd
 import os
 from django.conf import settings
+from prophet.utilities import regressor_coefficients
 
+# 予測対象の冬季月（シーズン順）
+WINTER_MONTHS = [11, 12, 1, 2, 3, 4]
 
-def load_model(model_path):
-    """Prophet モデルを読み込む"""
-    full_path = os.path.join(settings.BASE_DIR, model_path)
+ALL_MONTHS = list(range(1, 13))
+
+# 予測期間（モデルの学習データの翌月から12ヶ月先まで）
+FORECAST_PERIODS = 12
+FORECAST_FREQ = 'MS'
+
+# Prophet の予測区間は numpy のグローバル乱数でサンプリングされるため、
+# シードを固定して予測をシリアライズし、同じ入力に対して同じ結果を返す
+PREDICTION_RANDOM_SEED = 0
+
+_predict_lock = threading.Lock()
+
+# シナリオ予測（キー, 表示名, 暖かさの分位点）
+FORECAST_SCENARIOS = [
+    ('cold', '寒冬', 0.1),
+    ('normal', '平年', 0.5),
+    ('warm', '暖冬', 0.9),
+]
+
+# リグレッサーの値が大きいほど暖冬となる場合は 1、寒冬となる場合は -1
+REGRESSOR_WARMTH = {
+    '日最高気温の平均(℃)': 1,
+    '降雪量日合計3cm以上日数(日)': -1,
+    '日最高気温0℃未満日数(日)': -1,
+}
+
+# プロセス内で共有する読み取り専用のモデル・データ（ファイル更新時は再読み込み）
+_shared_objects = {}
+_shared_lock = threading.Lock()
+
+
+def _load_shared(path, loader):
+    """ファイルから読み込んだオブジェクトをプロセス内で共有する"""
+    full_path = os.path.join(settings.BASE_DIR, path)
     if not os.path.exists(full_path):
         return None
-    
+
+    signature = get_file_signature(path)
+    with _shared_lock:
+        cached = _shared_objects.get(full_path)
+        if cached is None or cached[0] != signature:
+            cached = (signature, loader(full_path))
+            _shared_objects[full_path] = cached
+    return cached[1]
+
+
+def _read_model(full_path):
     with open(full_path, 'rb') as f:
         model = pickle.load(f)
     return model
 
 
+def load_model(model_path):
+    """Prophet モデルを読み込む
+
+    戻り値はスレッド間で共有されるため、呼び出し側で変更しないこと。
+    """
+    return _load_shared(model_path, _read_model)
+
+
 def load_csv_data(csv_path):
-    """CSVデータを読み込む"""
-    full_path = os.path.join(settings.BASE_DIR, csv_path)
-    if not os.path.exists(full_path):
-        return None
-    
+    """CSVデータを読み込む
+
+    戻り値はスレッド間で共有されるため、呼び出し側で変更しないこと。
+    """
+    return _load_shared(csv_path, _read_csv_data)
+
+
+def _read_csv_data(full_path):
     df = pd.read_csv(full_path)
     df['ds'] = pd.to_datetime(df['年月'], format='%b-%y')
     df = df.rename(columns={'最深積雪(cm)': 'y'})
@@ -30,22 +88,110 @@ def load_csv_data(csv_path):
     return df
 
 
-def create_prediction_data(model, historical_df, selected_months):
-    """予測データを生成"""
+# ファイル内容のハッシュ（更新時刻・サイズが変わった場合のみ再計算）
+_file_digests = {}
+_file_digest_lock = threading.Lock()
+
+
+def get_file_signature(path):
+    """ファイル内容のハッシュからシグネチャを作成
+
+    デプロイごとに更新時刻が異なっても、同じ内容であればインスタンス間で同じ値になる。
+    """
+    full_path = os.path.join(settings.BASE_DIR, path)
+    try:
+        stat = os.stat(full_path)
+    except OSError:
+        return f"{path}:missing"
+
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _file_digest_lock:
+        cached = _file_digests.get(full_path)
+    if cached is None or cached[0] != key:
+        hasher = hashlib.sha1()
+        with open(full_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                hasher.update(chunk)
+        cached = (key, hasher.hexdigest())
+        with _file_digest_lock:
+            _file_digests[full_path] = cached
+    return f"{path}:{cached[1]}"
+
+
+def get_data_version(resorts):
+    """スキー場のモデル・CSVの状態からデータバージョンを計算
+
+    いずれかのモデルまたはデータセットが更新されると値が変わる。
+    """
+    hasher = hashlib.sha1()
+    for resort in resorts:
+        hasher.update(f"{resort.pk}|{get_file_signature(resort.model_file)}|".encode())
+        hasher.update(f"{get_file_signature(resort.csv_file)}\n".encode())
+    return hasher.hexdigest()
+
+
+def get_training_data(model, historical_df):
+    """配信中のモデルと同じ前処理の学習データ（冬季月の行、積雪量の欠測は0とする）"""
+    columns = ['ds', 'y'] + list(model.extra_regressors.keys())
+    df = historical_df[historical_df['ds'].dt.month.isin(WINTER_MONTHS)]
+    return df[columns].fillna({'y': 0}).reset_index(drop=True)
+
+
+def get_observed_data(historical_df):
+    """冬季月で積雪量の観測がある行（予測精度の評価用）"""
+    df = historical_df[historical_df['ds'].dt.month.isin(WINTER_MONTHS)]
+    return df.dropna(subset=['y'])[['ds', 'y']].reset_index(drop=True)
+
+
+def get_season_start_year(dates):
+    """日付のシーズン開始年を返す（11月-4月を1シーズンとする）"""
+    return dates.dt.year - (dates.dt.month < 11).astype(int)
+
+
+def calculate_seasonal_average(historical_df, seasons=10):
+    """直近シーズンの月別平均積雪量を計算"""
+    df = historical_df[historical_df['ds'].dt.month.isin(WINTER_MONTHS)]
+    df = df.assign(season=get_season_start_year(df['ds']), value=df['y'].clip(lower=0))
+    df = df.dropna(subset=['value'])
+
+    target_seasons = sorted(df['season'].unique())[-seasons:]
+    df = df[df['season'].isin(target_seasons)]
+    return df.groupby(df['ds'].dt.month)['value'].mean().reindex(WINTER_MONTHS)
+
+
+def predict_forecast(model, future_df):
+    """乱数シードを固定して予測を実行（同じ入力には同じ結果を返す）"""
+    with _predict_lock:
+        np.random.seed(PREDICTION_RANDOM_SEED)
+        return model.predict(future_df)
+
+
+def create_future_dataframe(model, historical_df):
+    """予測用のデータフレームを作成（未来のリグレッサーは過去の月別平均）"""
     # 12ヶ月先まで予測
-    future_df = model.make_future_dataframe(periods=12, freq='MS')
+    future_df = model.make_future_dataframe(periods=FORECAST_PERIODS, freq=FORECAST_FREQ)
     
     # リグレッサーが存在する場合の処理
     regressor_names = list(model.extra_regressors.keys())
     if regressor_names:
-        historical_df['month'] = historical_df['ds'].dt.month
-        seasonal_averages = historical_df.groupby('month')[regressor_names].mean().reset_index()
+        seasonal_averages = historical_df.groupby(historical_df['ds'].dt.month.rename('month'))[
+            regressor_names
+        ].mean().reset_index()
         future_df['month'] = future_df['ds'].dt.month
         future_df = pd.merge(future_df, seasonal_averages, on='month', how='left').drop(columns=['month'])
         future_df = future_df.ffill().bfill()
+    return future_df
+
+
+def create_prediction_data(model, historical_df, selected_months):
+    """予測データを生成
+
+    model・historical_df は変更しないため、複数スレッドから同時に呼び出せる。
+    """
+    future_df = create_future_dataframe(model, historical_df)
     
     # 予測実行
-    forecast = model.predict(future_df)
+    forecast = predict_forecast(model, future_df)
     
     # 未来の予測データのみ抽出
     future_forecast = forecast[forecast['ds'] > historical_df['ds'].max()].copy()
@@ -61,6 +207,160 @@ def create_prediction_data(model, historical_df, selected_months):
     return future_forecast, forecast, historical_df
 
 
+def get_regressor_effects(model, forecast):
+    """リグレッサー1単位の変化が各予測日の yhat に与える影響（予測日 × リグレッサー）"""
+    regressor_names = list(model.extra_regressors.keys())
+    effects = np.zeros((len(forecast), len(regressor_names)))
+    if not regressor_names:
+        return effects
+
+    coefficients = regressor_coefficients(model).set_index('regressor')
+    trend = forecast['trend'].to_numpy()
+    for j, name in enumerate(regressor_names):
+        coef = coefficients.loc[name, 'coef']
+        if coefficients.loc[name, 'regressor_mode'] == 'additive':
+            effects[:, j] = coef
+        else:
+            effects[:, j] = coef * trend
+    return effects
+
+
+def create_regressor_terms(model, historical_df, forecast):
+    """未来予測日ごとのリグレッサー基準値（月別平均）と影響係数
+
+    create_prediction_data と同じ基準値を使うため、ここからの差分に影響係数を掛けると
+    model.predict を呼ばずに予測値の変化量を計算できる。
+    """
+    regressor_names = list(model.extra_regressors.keys())
+    future = forecast[forecast['ds'] > historical_df['ds'].max()].reset_index(drop=True)
+    baseline = historical_df.groupby(historical_df['ds'].dt.month)[regressor_names].mean()
+    return {
+        'names': regressor_names,
+        'months': future['ds'].dt.month.to_numpy(),
+        'baseline': baseline.reindex(future['ds'].dt.month).to_numpy(),
+        'effects': get_regressor_effects(model, future),
+    }
+
+
+def _apply_regressor_change(forecast, historical_df, change, regressor_terms):
+    """リグレッサーの変化量から未来予測の変化量を計算して反映"""
+    future = forecast[forecast['ds'] > historical_df['ds'].max()].reset_index(drop=True)
+    n_repeats = len(change) // len(future)
+    delta = (change * np.tile(regressor_terms['effects'], (n_repeats, 1))).sum(axis=1)
+
+    result = pd.DataFrame({'ds': np.tile(future['ds'].to_numpy(), n_repeats), 'delta': delta})
+    for col in ['yhat', 'yhat_lower', 'yhat_upper']:
+        result[col] = np.clip(np.tile(future[col].to_numpy(), n_repeats) + delta, 0, None)
+    return result
+
+
+def create_scenario_data(model, historical_df, forecast, regressor_terms):
+    """寒冬・平年・暖冬シナリオの予測を作成
+
+    リグレッサーを過去の月別分位点に置き換えた全シナリオを1つのフレームに積み上げ、
+    ベースライン予測からの差分を1回のベクトル演算で計算する（model.predict は呼ばない）。
+    """
+    regressor_names = regressor_terms['names']
+    months = pd.Series(regressor_terms['months'])
+    by_month = historical_df.groupby(historical_df['ds'].dt.month)[regressor_names]
+
+    def scenario_quantile(name, warmth):
+        direction = REGRESSOR_WARMTH.get(name, 0)
+        if direction == 0:
+            return 0.5
+        return warmth if direction > 0 else round(1 - warmth, 6)
+
+    levels = sorted({
+        scenario_quantile(name, warmth)
+        for name in regressor_names for _, _, warmth in FORECAST_SCENARIOS
+    })
+    quantiles = by_month.quantile(levels)
+
+    # 全シナリオの未来リグレッサーを積み上げたフレーム
+    frames = []
+    for key, _, warmth in FORECAST_SCENARIOS:
+        frame = pd.DataFrame({'scenario': key}, index=months.index)
+        for name in regressor_names:
+            q = scenario_quantile(name, warmth)
+            frame[name] = quantiles[name].xs(q, level=1).reindex(months).to_numpy()
+        frames.append(frame)
+    scenario_df = pd.concat(frames, ignore_index=True)
+
+    baseline = np.tile(regressor_terms['baseline'], (len(FORECAST_SCENARIOS), 1))
+    change = scenario_df[regressor_names].to_numpy() - baseline
+    result = _apply_regressor_change(forecast, historical_df, change, regressor_terms)
+    result.insert(0, 'scenario', scenario_df['scenario'])
+    return result.drop(columns=['delta'])
+
+
+def apply_regressor_overrides(forecast, historical_df, regressor_terms, overrides, mode='delta'):
+    """リグレッサーの月別上書き（What-if）を反映した予測を差分計算
+
+    overrides は {月: {リグレッサー名: 値}} の形式。mode が 'delta' の場合は
+    平年値からの増減、'value' の場合は上書きする値として扱う。
+    """
+    names = regressor_terms['names']
+    baseline = regressor_terms['baseline']
+    change = np.zeros_like(baseline)
+
+    for month, values in overrides.items():
+        mask = regressor_terms['months'] == month
+        for name, value in values.items():
+            if name not in names:
+                raise ValueError(f'リグレッサー "{name}" はこのモデルに存在しません。')
+            j = names.index(name)
+            change[mask, j] = value if mode == 'delta' else value - baseline[mask, j]
+
+    return _apply_regressor_change(forecast, historical_df, change, regressor_terms)
+
+
+def create_scenario_table(scenarios, selected_months):
+    """シナリオ予測をレスポンス用に整形"""
+    scenarios = scenarios[scenarios['ds'].dt.month.isin(selected_months)]
+    return [
+        {
+            'key': key,
+            'label': label,
+            'data': [
+                {
+                    'date': row.ds.strftime('%Y-%m'),
+                    'predicted': round(row.yhat, 1),
+                    'lower': round(row.yhat_lower, 1),
+                    'upper': round(row.yhat_upper, 1),
+                }
+                for row in scenarios[scenarios['scenario'] == key].itertuples(index=False)
+            ],
+        }
+        for key, label, _ in FORECAST_SCENARIOS
+    ]
+
+
+def create_scenario_datasets(scenarios, selected_months):
+    """比較グラフに重ねるシナリオ予測の折れ線データ"""
+    colors = {
+        'cold': 'rgba(30, 144, 255, 1)',
+        'normal': 'rgba(128, 128, 128, 1)',
+        'warm': 'rgba(255, 140, 0, 1)',
+    }
+    datasets = []
+    for key, label, _ in FORECAST_SCENARIOS:
+        values = scenarios[scenarios['scenario'] == key].groupby(
+            scenarios['ds'].dt.month
+        )['yhat'].first().reindex(selected_months)
+        datasets.append({
+            'type': 'line',
+            'label': f'{label}シナリオ',
+            'data': [float(val) if pd.notna(val) else 0 for val in values],
+            'backgroundColor': colors[key],
+            'borderColor': colors[key],
+            'borderWidth': 2,
+            'borderDash': [] if key == 'normal' else [6, 4],
+            'fill': False,
+            'tension': 0.3,
+        })
+    return datasets
+
+
 def create_comparison_data(forecast, historical_df, selected_months):
     """比較グラフ用のデータを作成"""
     historical_clipped = historical_df.copy()
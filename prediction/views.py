@@ -1,12 +1,31 @@
 import json
+import os
+from django.conf import settings
 from django.shortcuts import render
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from django.contrib.admin.views.decorators import staff_member_required
 from django.db import connection
-from .forms import PredictionForm
+from .admission import AdmissionRejected
+from .export import EXPORT_FORMATS, iter_export, iter_resort_forecasts
+from .forecasting import (
+    ForecastDataNotFound, get_forecast_or_stale, predict_limiter,
+)
+from .climatology import get_climatology
+from .forms import (
+    PredictionForm, ForecastForm, ClimatologyForm, RankingForm, ExportForm, WhatIfForm,
+    MemoryProfileForm,
+)
+from .memory import memory_sampler, tracemalloc_profiler
 from .models import SkiResort
-from .utils import load_model, load_csv_data, create_prediction_data, create_comparison_data
+from .ranking import get_forecast_matrix, rank_resorts
+from .utils import (
+    WINTER_MONTHS, get_data_version, create_comparison_data, create_scenario_table, create_scenario_datasets,
+    apply_regressor_overrides,
+)
 
 
 def index(request):
@@ -15,10 +34,41 @@ def index(request):
     return render(request, 'prediction/index.html', {'form': form})
 
 
-@require_http_methods(["POST"])
+def overloaded_response(error):
+    """混雑時のエラーレスポンス"""
+    response = JsonResponse({
+        'success': False,
+        'error': 'アクセスが集中しています。しばらくしてから再度お試しください。'
+    }, status=503)
+    response['Retry-After'] = str(error.retry_after)
+    return response
+
+
+def forecast_etag(data_version):
+    """予測レスポンスの ETag（データバージョンが変わると変わる）"""
+    return f'"forecast-{data_version}"'
+
+
+def set_forecast_cache_headers(response, data_version):
+    """GET の予測レスポンスにキャッシュ用のヘッダーを付ける"""
+    response['ETag'] = forecast_etag(data_version)
+    patch_cache_control(
+        response, public=True, max_age=getattr(settings, 'SNOW_DEEP_PREDICT_MAX_AGE', 300)
+    )
+    return response
+
+
+@require_http_methods(["GET", "POST"])
 def predict(request):
-    """予測実行"""
-    form = PredictionForm(request.POST)
+    """予測実行
+
+    GET は全ての冬季月をまとめて返し、ブラウザ・中間キャッシュで再利用できる
+    （月の絞り込みはクライアント側で行う）。POST は選択された月のみを返す。
+    """
+    if request.method == 'GET':
+        form = ForecastForm(request.GET)
+    else:
+        form = PredictionForm(request.POST)
     
     if not form.is_valid():
         return JsonResponse({
@@ -27,44 +77,76 @@ def predict(request):
         }, status=400)
     
     resort = form.cleaned_data['resort']
-    selected_months = [int(month) for month in form.cleaned_data['months']]
-    
-    # モデルとデータを読み込み
-    model = load_model(resort.model_file)
-    historical_df = load_csv_data(resort.csv_file)
-    
-    if model is None or historical_df is None:
-        return JsonResponse({
-            'success': False,
-            'error': f'{resort.name}のモデルまたはCSVファイルが見つかりません。'
-        }, status=500)
+    if request.method == 'GET':
+        selected_months = list(WINTER_MONTHS)
+        # 手元の予測が最新のデータによるものであれば計算せずに 304 を返す
+        data_version = get_data_version([resort])
+        if forecast_etag(data_version) in parse_etags(request.headers.get('If-None-Match', '')):
+            return set_forecast_cache_headers(HttpResponseNotModified(), data_version)
+    else:
+        selected_months = [int(month) for month in form.cleaned_data['months']]
     
     try:
-        # 予測実行
-        future_forecast, full_forecast, historical_df = create_prediction_data(
-            model, historical_df, selected_months
-        )
+        # 予測実行（同時リクエストは1回の計算にまとめる）
+        result = get_forecast_or_stale(resort)
+
+        future_forecast = result['future_forecast']
+        future_forecast = future_forecast[future_forecast['ds'].dt.month.isin(selected_months)]
         
+        # シナリオ予測（寒冬・平年・暖冬）
+        scenarios = create_scenario_table(result['scenarios'], selected_months)
+        scenario_values = {
+            scenario['key']: {row['date']: row['predicted'] for row in scenario['data']}
+            for scenario in scenarios
+        }
+
         # 予測データテーブル用の整形
         prediction_table = []
         for _, row in future_forecast.iterrows():
+            date = row['ds'].strftime('%Y-%m')
             prediction_table.append({
-                'date': row['ds'].strftime('%Y-%m'),
+                'date': date,
                 'predicted': round(row['yhat'], 1),
                 'lower': round(row['yhat_lower'], 1),
-                'upper': round(row['yhat_upper'], 1)
+                'upper': round(row['yhat_upper'], 1),
+                'cold': scenario_values['cold'].get(date),
+                'warm': scenario_values['warm'].get(date)
             })
         
         # 比較グラフ用データ
-        chart_data = create_comparison_data(full_forecast, historical_df, selected_months)
+        chart_data = create_comparison_data(
+            result['full_forecast'], result['historical_df'], selected_months
+        )
+        # 未来予測シーズンの直後にシナリオの折れ線を追加
+        chart_data['datasets'][1:1] = create_scenario_datasets(
+            result['scenarios'], selected_months
+        )
+        # クライアント側で月を絞り込むための各ラベルの月
+        chart_data['months'] = selected_months
         
-        return JsonResponse({
+        response = JsonResponse({
             'success': True,
+            'resort_id': resort.pk,
             'resort_name': resort.name,
             'prediction_table': prediction_table,
+            'scenarios': scenarios,
+            'regressors': result['regressor_terms']['names'],
             'chart_data': chart_data
         })
+        if request.method == 'GET':
+            # 混雑時に古い予測を返した場合も、内容のバージョンで ETag を付ける
+            set_forecast_cache_headers(response, result['data_version'])
+        return response
         
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+
+    except ForecastDataNotFound as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
     except Exception as e:
         return JsonResponse({
             'success': False,
@@ -72,6 +154,265 @@ def predict(request):
         }, status=500)
 
 
+@require_http_methods(["POST"])
+def whatif(request):
+    """リグレッサーを上書きした場合の予測（What-if）"""
+    form = WhatIfForm(request.POST)
+
+    if not form.is_valid():
+        return JsonResponse({
+            'success': False,
+            'errors': form.errors
+        }, status=400)
+
+    resort = form.cleaned_data['resort']
+    selected_months = form.cleaned_data['months']
+
+    try:
+        result = get_forecast_or_stale(resort)
+
+        # キャッシュ済みの予測と回帰係数から差分のみを計算
+        whatif_forecast = apply_regressor_overrides(
+            result['full_forecast'],
+            result['historical_df'],
+            result['regressor_terms'],
+            form.cleaned_data['overrides'],
+            form.cleaned_data['mode']
+        )
+        whatif_forecast = whatif_forecast[whatif_forecast['ds'].dt.month.isin(selected_months)]
+
+        prediction_table = []
+        for row in whatif_forecast.itertuples(index=False):
+            prediction_table.append({
+                'date': row.ds.strftime('%Y-%m'),
+                'predicted': round(row.yhat, 1),
+                'lower': round(row.yhat_lower, 1),
+                'upper': round(row.yhat_upper, 1),
+                'delta': round(row.delta, 1)
+            })
+
+        # 比較グラフの未来予測シーズン用データ（選択月の順）
+        by_month = whatif_forecast.groupby(whatif_forecast['ds'].dt.month)['yhat'].first()
+        forecast_data = [
+            float(by_month[month]) if month in by_month.index else 0
+            for month in selected_months
+        ]
+
+        return JsonResponse({
+            'success': True,
+            'resort_name': resort.name,
+            'prediction_table': prediction_table,
+            'forecast_data': forecast_data
+        })
+
+    except ValueError as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=400)
+
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+
+    except ForecastDataNotFound as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        }, status=500)
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'予測計算中にエラーが発生しました: {str(e)}'
+        }, status=500)
+
+
+@require_http_methods(["GET"])
+def climatology(request):
+    """スキー場の月別長期統計（平均・中央値・P10/P90・最大記録）"""
+    form = ClimatologyForm(request.GET)
+
+    if not form.is_valid():
+        return JsonResponse({
+            'success': False,
+            'errors': form.errors
+        }, status=400)
+
+    resort = form.cleaned_data['resort']
+
+    try:
+        rows = get_climatology(resort)
+        if not rows:
+            return JsonResponse({
+                'success': False,
+                'error': f'{resort.name}のCSVファイルが見つかりません。'
+            }, status=500)
+
+        response = JsonResponse({
+            'success': True,
+            'resort_name': resort.name,
+            'first_year': min(row.first_year for row in rows),
+            'last_year': max(row.last_year for row in rows),
+            'climatology': [
+                {
+                    'month': row.month,
+                    'mean': round(row.mean, 1),
+                    'median': round(row.median, 1),
+                    'p10': round(row.p10, 1),
+                    'p90': round(row.p90, 1),
+                    'record': round(row.record, 1),
+                    'record_date': row.record_date.strftime('%Y-%m'),
+                    'n': row.n,
+                }
+                for row in rows
+            ]
+        })
+        patch_cache_control(
+            response, public=True, max_age=getattr(settings, 'SNOW_DEEP_PREDICT_MAX_AGE', 300)
+        )
+        return response
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'長期統計の取得中にエラーが発生しました: {str(e)}'
+        }, status=500)
+
+
+@require_http_methods(["GET"])
+def ranking(request):
+    """スキー場横断の積雪量ランキング"""
+    form = RankingForm(request.GET)
+
+    if not form.is_valid():
+        return JsonResponse({
+            'success': False,
+            'errors': form.errors
+        }, status=400)
+
+    selected_months = form.cleaned_data['months']
+    statistic = 'deviation' if form.cleaned_data['by'] == 'deviation' else 'yhat'
+
+    try:
+        matrix = get_forecast_matrix()
+        ranking_data = rank_resorts(matrix, selected_months, statistic, form.cleaned_data['top'])
+
+        return JsonResponse({
+            'success': True,
+            'by': form.cleaned_data['by'],
+            'months': selected_months,
+            'ranking': ranking_data
+        })
+
+    except AdmissionRejected as e:
+        return overloaded_response(e)
+
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': f'ランキング計算中にエラーが発生しました: {str(e)}'
+        }, status=500)
+
+
+@require_http_methods(["GET"])
+def export(request):
+    """予測データ・履歴データの一括エクスポート"""
+    form = ExportForm(request.GET)
+
+    if not form.is_valid():
+        return JsonResponse({
+            'success': False,
+            'errors': form.errors
+        }, status=400)
+
+    # 応答の送信開始後は 503 を返せないため、最初のスキー場の予測のみ先に取得して混雑を確認する
+    # （以降のスキー場は1件ずつ取得し、メモリ使用量を対象数によらず一定に保つ）
+    resorts = list(form.cleaned_data['resort'].order_by('pk'))
+    if resorts:
+        try:
+            get_forecast_or_stale(resorts[0])
+        except ForecastDataNotFound:
+            pass
+        except AdmissionRejected as e:
+            return overloaded_response(e)
+
+    export_format = form.cleaned_data['format']
+    compress = form.cleaned_data['gzip']
+    chunks = iter_export(
+        iter_resort_forecasts(resorts),
+        export_format,
+        form.cleaned_data['start'],
+        form.cleaned_data['end'],
+        compress
+    )
+
+    filename = f'snow_deep_export.{export_format}'
+    content_type = EXPORT_FORMATS[export_format][1]
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def metrics(request):
+    """ワーカープロセスの負荷状況（PID・メモリ使用量を含むため staff ユーザーのみ）"""
+    return JsonResponse({
+        'pid': os.getpid(),
+        'admission': predict_limiter.stats(),
+        'memory': memory_sampler.stats()
+    })
+
+
+@staff_member_required
+@require_http_methods(["GET"])
+def memory_profile(request):
+    """tracemalloc による基準時点からのメモリ増減（モジュール別、応答したワーカーのみ）
+
+    SNOW_DEEP_TRACEMALLOC_ON_START を有効にすると全ワーカーが起動時から計測するため、
+    どのワーカーが応答しても起動時点からの差分を返す。
+    action=start で応答したワーカーの計測を開始し、以降は基準時点からの差分を返す。
+    action=reset は差分を返したうえで現在を新しい基準にし、action=stop で計測を終了する。
+    """
+    form = MemoryProfileForm(request.GET)
+
+    if not form.is_valid():
+        return JsonResponse({
+            'success': False,
+            'errors': form.errors
+        }, status=400)
+
+    action = form.cleaned_data['action']
+    if action == 'start':
+        tracemalloc_profiler.start()
+        return JsonResponse({'success': True, 'pid': os.getpid(), 'tracing': True})
+
+    if not tracemalloc_profiler.is_tracing():
+        return JsonResponse({
+            'success': False,
+            'pid': os.getpid(),
+            'error': (
+                'このワーカーでは tracemalloc が開始されていません。'
+                'SNOW_DEEP_TRACEMALLOC_ON_START=True で全ワーカーの計測を開始してください。'
+            )
+        }, status=409)
+
+    if action == 'stop':
+        tracemalloc_profiler.stop()
+        return JsonResponse({'success': True, 'pid': os.getpid(), 'tracing': False})
+
+    return JsonResponse({
+        'success': True,
+        'pid': os.getpid(),
+        'tracing': True,
+        **tracemalloc_profiler.diff(form.cleaned_data['top'], reset=(action == 'reset'))
+    })
+
+
 def health_check(request):
     """ALB ヘルスチェック用エンドポイント"""
     try:
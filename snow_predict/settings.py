@@ -16,7 +16,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-your-secret-key-here'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# 負荷試験（loadtest）では DJANGO_DEBUG=False で本番と同じ条件にする
+DEBUG = os.environ.get('DJANGO_DEBUG', 'True') == 'True'
 
 ALLOWED_HOSTS = ['localhost', '127.0.0.1']
 
@@ -41,6 +42,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'prediction.middleware.MemoryGrowthMiddleware',
 ]
 
 ROOT_URLCONF = 'snow_predict.urls'
@@ -118,3 +120,53 @@ STATICFILES_DIRS = [
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Forecast cache
+# 同一スキー場の予測はキャッシュし、同時リクエストは1回の計算にまとめる
+# ワーカー・インスタンス間のロックには共有キャッシュが必要（本番環境は Redis、settings_production 参照）
+
+SNOW_DEEP_FORECAST_CACHE_TIMEOUT = 3600  # 鮮度を保つ秒数
+SNOW_DEEP_FORECAST_STALE_TIMEOUT = 86400  # 期限切れ後も再計算中に返せる秒数
+SNOW_DEEP_FORECAST_LOCK_TIMEOUT = 30  # ワーカー間ロックの有効秒数
+SNOW_DEEP_FORECAST_WAIT_TIMEOUT = 25  # 先行リクエストの計算を待つ最大秒数
+
+
+# Admission control
+# 予測計算の同時実行数を制限し、超過分は待機キューで待たせる（ワーカープロセス単位）
+# 上限を超えたリクエストは古い予測があればそれを返し、なければ 503 + Retry-After を返す
+# gthread ワーカー（gunicorn_production.conf.py の既定）のスレッドに対して働くため、
+# 同時実行数 + 待機数はスレッド数（既定8）より小さくし、軽いリクエスト用のスレッドを残す
+
+# model.predict は乱数シードを固定するためプロセス内で直列化される。2以上にしても
+# 追加で受け付けた計算は期限なしでロックを待つだけのため、1 として超過分は待機キューで待たせる
+SNOW_DEEP_PREDICT_MAX_CONCURRENCY = 1  # 同時に実行する予測計算の数
+SNOW_DEEP_PREDICT_QUEUE_DEPTH = 4  # 待機できるリクエスト数
+SNOW_DEEP_PREDICT_QUEUE_TIMEOUT = 5  # 待機の最大秒数
+SNOW_DEEP_PREDICT_RETRY_AFTER = 5  # 拒否時に返す Retry-After 秒数
+
+
+# Forecast response cache
+# GET /predict/ は全ての冬季月を返し、ETag（データバージョン）付きでキャッシュさせる
+
+SNOW_DEEP_PREDICT_MAX_AGE = 300  # ブラウザ・中間キャッシュで再検証せずに使える秒数
+
+
+# Memory instrumentation
+# ワーカーごとに RSS・キャッシュサイズを記録し /metrics/ で公開する
+# /metrics/ と tracemalloc の差分（/metrics/memory/）は staff ユーザーのみ取得でき、応答したワーカーの値を返す
+# 全ワーカーの負荷状況は記録間隔ごとに prediction.memory ロガーへ worker_stats として出力する
+
+SNOW_DEEP_MEMORY_SAMPLE_INTERVAL = 30  # RSS・キャッシュサイズの記録間隔（秒）
+SNOW_DEEP_MEMORY_SAMPLE_HISTORY = 120  # 保持するサンプル数
+SNOW_DEEP_MEMORY_LOG_PATHS = ['/predict/']  # リクエストごとのメモリ増加を計測するパス
+SNOW_DEEP_MEMORY_LOG_THRESHOLD_MB = 20  # この値以上増加したリクエストをログに記録
+SNOW_DEEP_TRACEMALLOC_FRAMES = 1  # tracemalloc が保持するスタックの深さ
+# 全ワーカーで起動時から tracemalloc を開始する（計測のオーバーヘッドがあるため調査時のみ有効にする）
+SNOW_DEEP_TRACEMALLOC_ON_START = os.environ.get('SNOW_DEEP_TRACEMALLOC_ON_START', 'False') == 'True'
+SNOW_DEEP_WORKER_STATS_LOG = True  # 負荷状況（予測計算の待機キュー長・拒否数、RSS）をログに出力
+
+
+# Prediction log retention
+# 保持期間を過ぎた予測結果ログは compact_predictions で日別集計に置き換える
+
+SNOW_DEEP_PREDICTION_RETENTION_DAYS = 30  # 予測結果ログを保持する日数
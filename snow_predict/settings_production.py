@@ -110,11 +110,19 @@ LOGGING = {
     },
 }
 
-# Cache configuration (Redis推奨)
+# Cache configuration (Redis)
+# 予測キャッシュ・古い予測の共有と、計算するワーカーを1つに絞るロック（cache.add）は
+# ワーカープロセス・インスタンス間で共有する必要があるため、プロセス内キャッシュは使わない
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+        'BACKEND': 'django_redis.cache.RedisCache',
+        'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+        'KEY_PREFIX': 'snow_deep',
+        'OPTIONS': {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'SOCKET_CONNECT_TIMEOUT': 5,
+            'SOCKET_TIMEOUT': 5,
+        },
     }
 }
 
@@ -1,5 +1,11 @@
 // グローバル変数
 let comparisonChart = null;
+const forecastCache = new Map();  // スキー場ごとの予測結果（全ての冬季月）
+let currentResult = null;         // 表示中のスキー場の予測結果（全ての冬季月）
+const climatologyCache = new Map();  // スキー場ごとの月別長期統計
+let whatifResult = null;          // 直近の What-if 結果（全ての冬季月）
+let whatifOverrides = {};         // What-if の上書き {月: {リグレッサー名: 平年値からの増減}}
+let whatifTimer = null;
 
 // チャートのテーマ取得
 function getChartTheme() {
@@ -29,16 +35,19 @@ document.addEventListener('DOMContentLoaded', function() {
             return;
         }
 
+        const resortId = document.getElementById('id_resort').value;
+
+        // 取得済みのスキー場は再リクエストせずに表示
+        if (forecastCache.has(resortId)) {
+            displayResults(forecastCache.get(resortId));
+            return;
+        }
+
         // UI状態の更新
         showLoading();
         
-        // フォームデータの準備
-        const formData = new FormData(form);
-        
-        // Ajax リクエスト
-        fetch('/predict/', {
-            method: 'POST',
-            body: formData,
+        // Ajax リクエスト（全ての冬季月を取得し、月の絞り込みはブラウザ側で行う）
+        fetch(`/predict/?resort=${encodeURIComponent(resortId)}`, {
             headers: {
                 'X-Requested-With': 'XMLHttpRequest',
             }
@@ -48,6 +57,7 @@ document.addEventListener('DOMContentLoaded', function() {
             hideLoading();
             
             if (data.success) {
+                forecastCache.set(resortId, data);
                 displayResults(data);
             } else {
                 showError(data.error || '予測の実行に失敗しました。');
@@ -60,6 +70,26 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
+    // 月の選択変更は取得済みの結果を絞り込んで再描画
+    document.querySelectorAll('input[name="months"]').forEach(checkbox => {
+        checkbox.addEventListener('change', function() {
+            if (currentResult && getSelectedMonths().length > 0) {
+                renderResults();
+            }
+        });
+    });
+
+    // 長期統計の表示切り替え
+    document.getElementById('climatology-toggle').addEventListener('change', function() {
+        if (currentResult) {
+            renderResults('none');
+        }
+    });
+
+    // What-if シミュレーション
+    document.getElementById('whatif-month').addEventListener('change', syncWhatIfSliders);
+    document.getElementById('whatif-reset').addEventListener('click', resetWhatIf);
+
     // 初期状態で全ての月をチェック
     initializeMonthSelection();
 });
@@ -82,6 +112,33 @@ function validateForm() {
     return true;
 }
 
+// 選択中の月
+function getSelectedMonths() {
+    return Array.from(document.querySelectorAll('input[name="months"]:checked'))
+        .map(checkbox => parseInt(checkbox.value, 10));
+}
+
+// 全ての冬季月の予測結果を選択月に絞り込む
+function sliceResults(data, months) {
+    const inMonths = row => months.includes(parseInt(row.date.slice(5), 10));
+    const indices = data.chart_data.months
+        .map((month, index) => index)
+        .filter(index => months.includes(data.chart_data.months[index]));
+    const pick = values => indices.map(index => values[index]);
+
+    return {
+        ...data,
+        prediction_table: data.prediction_table.filter(inMonths),
+        scenarios: (data.scenarios || []).map(scenario => ({...scenario, data: scenario.data.filter(inMonths)})),
+        chart_data: {
+            ...data.chart_data,
+            months: pick(data.chart_data.months),
+            labels: pick(data.chart_data.labels),
+            datasets: data.chart_data.datasets.map(dataset => ({...dataset, data: pick(dataset.data)}))
+        }
+    };
+}
+
 // ローディング表示
 function showLoading() {
     document.getElementById('loading-spinner').style.display = 'block';
@@ -119,11 +176,15 @@ function displayResults(data) {
     // スキー場名を設定
     document.getElementById('resort-name').textContent = data.resort_name;
     
-    // 予測テーブルを更新
-    updatePredictionTable(data.prediction_table);
-    
-    // 比較グラフを更新
-    updateComparisonChart(data.chart_data);
+    // What-if の初期化
+    currentResult = data;
+    whatifResult = null;
+    whatifOverrides = {};
+    setupWhatIfControls(data.regressors || []);
+
+    // 予測テーブル・比較グラフを更新
+    renderResults();
+    loadClimatology(data.resort_id);
     
     // 結果コンテナを表示
     const resultsContainer = document.getElementById('results-container');
@@ -131,6 +192,131 @@ function displayResults(data) {
     resultsContainer.classList.add('fade-in');
 }
 
+// 選択月に絞り込んでテーブル・グラフを描画（What-if 適用中はその結果を反映）
+// updateMode を指定した場合はグラフを作り直さずに更新する
+function renderResults(updateMode) {
+    const months = getSelectedMonths();
+    const view = sliceResults(currentResult, months);
+    let tableRows = view.prediction_table;
+    let chartData = view.chart_data;
+
+    if (whatifResult) {
+        const whatifRows = {};
+        whatifResult.prediction_table.forEach(row => {
+            whatifRows[row.date] = row;
+        });
+        tableRows = tableRows.map(row => ({...row, ...whatifRows[row.date], cold: row.cold, warm: row.warm}));
+
+        // 未来予測シーズン（先頭のデータセット）を What-if の値に置き換える
+        const forecastData = chartData.months.map(month => {
+            const index = currentResult.chart_data.months.indexOf(month);
+            return whatifResult.forecast_data[index];
+        });
+        chartData = {
+            ...chartData,
+            datasets: [{...chartData.datasets[0], data: forecastData}, ...chartData.datasets.slice(1)]
+        };
+    }
+
+    // 長期統計を重ねる
+    const climatology = climatologyCache.get(currentResult.resort_id);
+    if (climatology && document.getElementById('climatology-toggle').checked) {
+        chartData = {
+            ...chartData,
+            datasets: [...chartData.datasets, ...createClimatologyDatasets(climatology, chartData.months)]
+        };
+    }
+
+    updatePredictionTable(tableRows);
+    if (updateMode && comparisonChart) {
+        comparisonChart.data = chartData;
+        comparisonChart.update(updateMode);
+    } else {
+        updateComparisonChart(chartData);
+    }
+    updateWhatIfMonths(months);
+}
+
+// 長期統計の取得（スキー場ごとに1回）
+function loadClimatology(resortId) {
+    if (climatologyCache.has(resortId)) {
+        return;
+    }
+
+    fetch(`/climatology/?resort=${encodeURIComponent(resortId)}`, {
+        headers: {
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            return;
+        }
+        climatologyCache.set(resortId, data);
+        if (currentResult && currentResult.resort_id === resortId) {
+            renderResults('none');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+    });
+}
+
+// 長期統計の折れ線データ（P10〜P90 は帯で表示）
+function createClimatologyDatasets(climatology, months) {
+    const byMonth = {};
+    climatology.climatology.forEach(row => {
+        byMonth[row.month] = row;
+    });
+    const values = key => months.map(month => (byMonth[month] ? byMonth[month][key] : null));
+    const period = `${climatology.first_year}-${climatology.last_year}`;
+    const line = {
+        type: 'line',
+        fill: false,
+        tension: 0.3,
+        pointRadius: 0,
+        borderWidth: 1
+    };
+
+    return [
+        {
+            ...line,
+            label: `P10 (${period})`,
+            data: values('p10'),
+            borderColor: 'rgba(46, 139, 87, 0.6)',
+            backgroundColor: 'rgba(46, 139, 87, 0.6)'
+        },
+        {
+            ...line,
+            label: `P90 (${period})`,
+            data: values('p90'),
+            fill: '-1',
+            borderColor: 'rgba(46, 139, 87, 0.6)',
+            backgroundColor: 'rgba(46, 139, 87, 0.12)'
+        },
+        {
+            ...line,
+            label: `平均 (${period})`,
+            data: values('mean'),
+            borderWidth: 2,
+            borderDash: [2, 2],
+            borderColor: 'rgba(46, 139, 87, 1)',
+            backgroundColor: 'rgba(46, 139, 87, 1)'
+        },
+        {
+            type: 'line',
+            label: '最大記録',
+            data: values('record'),
+            showLine: false,
+            pointStyle: 'triangle',
+            pointRadius: 6,
+            borderColor: 'rgba(75, 0, 130, 1)',
+            backgroundColor: 'rgba(75, 0, 130, 0.8)'
+        }
+    ];
+}
+
 // 予測テーブル更新
 function updatePredictionTable(data) {
     const tbody = document.querySelector('#prediction-table tbody');
@@ -143,6 +329,8 @@ function updatePredictionTable(data) {
             <td class="text-primary fw-bold">${row.predicted}</td>
             <td class="text-muted">${row.lower}</td>
             <td class="text-muted">${row.upper}</td>
+            <td class="text-info">${row.cold ?? '-'}</td>
+            <td class="text-warning">${row.warm ?? '-'}</td>
         `;
         tbody.appendChild(tr);
     });
@@ -244,3 +432,125 @@ function initializeMonthSelection() {
         checkbox.checked = true; // 全ての月を初期選択
     });
 }
+
+// What-if の対象月を選択中の月に合わせる
+function updateWhatIfMonths(months) {
+    const monthSelect = document.getElementById('whatif-month');
+    const previous = monthSelect.value;
+
+    monthSelect.innerHTML = '';
+    months.forEach(month => {
+        const option = document.createElement('option');
+        option.value = month;
+        option.textContent = `${month}月`;
+        monthSelect.appendChild(option);
+    });
+
+    if (months.includes(parseInt(previous, 10))) {
+        monthSelect.value = previous;
+    }
+    syncWhatIfSliders();
+}
+
+// What-if コントロールの作成
+function setupWhatIfControls(regressors) {
+    const slidersContainer = document.getElementById('whatif-sliders');
+
+    slidersContainer.innerHTML = '';
+    regressors.forEach((name, index) => {
+        const div = document.createElement('div');
+        div.className = 'mb-3';
+        div.innerHTML = `
+            <label for="whatif-slider-${index}" class="form-label d-flex justify-content-between">
+                <span>${name}</span>
+                <span class="fw-bold" id="whatif-value-${index}">±0</span>
+            </label>
+            <input type="range" class="form-range whatif-slider" id="whatif-slider-${index}"
+                   min="-10" max="10" step="0.5" value="0">
+        `;
+        const slider = div.querySelector('input');
+        slider.dataset.regressor = name;
+        slider.dataset.index = index;
+        slider.addEventListener('input', onWhatIfSliderInput);
+        slidersContainer.appendChild(div);
+    });
+}
+
+// スライダー操作
+function onWhatIfSliderInput(e) {
+    const slider = e.target;
+    const month = document.getElementById('whatif-month').value;
+    const value = parseFloat(slider.value);
+
+    whatifOverrides[month] = whatifOverrides[month] || {};
+    whatifOverrides[month][slider.dataset.regressor] = value;
+    document.getElementById(`whatif-value-${slider.dataset.index}`).textContent = formatDelta(value);
+
+    // 連続操作中はリクエストをまとめる
+    clearTimeout(whatifTimer);
+    whatifTimer = setTimeout(requestWhatIf, 100);
+}
+
+// 対象月の変更時にスライダーを現在の上書き値に合わせる
+function syncWhatIfSliders() {
+    const month = document.getElementById('whatif-month').value;
+    document.querySelectorAll('.whatif-slider').forEach(slider => {
+        const value = (whatifOverrides[month] || {})[slider.dataset.regressor] || 0;
+        slider.value = value;
+        document.getElementById(`whatif-value-${slider.dataset.index}`).textContent = formatDelta(value);
+    });
+}
+
+function formatDelta(value) {
+    return value > 0 ? `+${value}` : (value < 0 ? `${value}` : '±0');
+}
+
+// What-if 予測の取得
+function requestWhatIf() {
+    if (!currentResult) {
+        return;
+    }
+
+    const requestedResult = currentResult;
+    const form = document.getElementById('prediction-form');
+    const formData = new FormData();
+    formData.append('csrfmiddlewaretoken', form.querySelector('[name="csrfmiddlewaretoken"]').value);
+    formData.append('resort', currentResult.resort_id);
+    // 月を指定せずに全ての冬季月を取得し、月の絞り込みはブラウザ側で行う
+    formData.append('overrides', JSON.stringify(whatifOverrides));
+
+    fetch('/whatif/', {
+        method: 'POST',
+        body: formData,
+        headers: {
+            'X-Requested-With': 'XMLHttpRequest',
+        }
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // 応答待ちの間に別のスキー場を表示した場合は破棄
+            if (currentResult !== requestedResult) {
+                return;
+            }
+            whatifResult = data;
+            renderResults('none');
+        } else {
+            showError(data.error || 'What-if 予測の実行に失敗しました。');
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+    });
+}
+
+// What-if のリセット
+function resetWhatIf() {
+    if (!currentResult) {
+        return;
+    }
+    clearTimeout(whatifTimer);
+    whatifOverrides = {};
+    whatifResult = null;
+    renderResults('none');
+}